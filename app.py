@@ -5,8 +5,10 @@ This agent searches, reads, and makes recommendations based on documentation.
 """
 
 import os
-import json
+import codecs
+import heapq
 import logging
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
 
 from strands.agent.agent import Agent
@@ -14,9 +16,78 @@ from strands.models.bedrock import BedrockModel
 from strands.tools.registry import ToolRegistry
 from strands.tools.tools import PythonAgentTool as Tool
 
+from bedrock_integration import BedrockClient
+from docs_processor import DocumentationProcessor, reciprocal_rank_fusion
+from tool_output import format_json
+
 # Configure logging for this module
 logger = logging.getLogger(__name__)
 
+# Maximum number of bytes document_read returns per call
+MAX_READ_BYTES = 256 * 1024
+
+# Lowest embedding similarity at which a file is blended into search
+# results; anything less similar is unrelated to the query
+MIN_SEMANTIC_SCORE = 0.2
+
+# Tool specs never change, so they are built once and shared by every instance
+_RESET_SPEC = {
+    "name": "reset_conversation",
+    "description": "Reset the conversation history to start fresh",
+    "inputSchema": {
+        "json": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    }
+}
+
+_SEARCH_SPEC = {
+    "name": "document_search",
+    "description": "Search through documentation for specific terms or topics",
+    "inputSchema": {
+        "json": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The search query"
+                },
+                "max_results": {
+                    "type": "integer",
+                    "description": "Maximum number of results to return",
+                    "default": 5
+                }
+            },
+            "required": ["query"]
+        }
+    }
+}
+
+_READ_SPEC = {
+    "name": "document_read",
+    "description": "Read the content of a specific documentation file",
+    "inputSchema": {
+        "json": {
+            "type": "object",
+            "properties": {
+                "file_path": {
+                    "type": "string",
+                    "description": "Path to the documentation file to read"
+                },
+                "offset": {
+                    "type": "integer",
+                    "description": "Byte offset to start reading from, to continue a truncated read",
+                    "default": 0
+                }
+            },
+            "required": ["file_path"]
+        }
+    }
+}
+
+
 # Define tools for documentation handling
 class ConversationResetTool(Tool):
     """Tool for resetting the conversation history."""
@@ -25,17 +96,7 @@ class ConversationResetTool(Tool):
         """Initialize the conversation reset tool."""
         super().__init__(
             tool_name="reset_conversation",
-            tool_spec={
-                "name": "reset_conversation",
-                "description": "Reset the conversation history to start fresh",
-                "inputSchema": {
-                    "json": {
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                }
-            },
+            tool_spec=_RESET_SPEC,
             callback=self._execute
         )
     
@@ -52,33 +113,20 @@ class ConversationResetTool(Tool):
 class DocumentSearchTool(Tool):
     """Tool for searching through documentation."""
     
-    def __init__(self, docs_path: str = "./docs"):
-        """Initialize with path to documentation files."""
+    def __init__(self, docs_path: str = "./docs", processor: Optional[DocumentationProcessor] = None):
+        """
+        Initialize with path to documentation files.
+        
+        Args:
+            docs_path: The path to the documentation files
+            processor: Processor to share; a new one is indexed on first search if omitted
+        """
         self.docs_path = docs_path
+        self.processor = processor or DocumentationProcessor(docs_path)
         logger.info(f"DocumentSearchTool initialized with docs_path: '{docs_path}'")
         super().__init__(
             tool_name="document_search",
-            tool_spec={
-                "name": "document_search",
-                "description": "Search through documentation for specific terms or topics",
-                "inputSchema": {
-                    "json": {
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "The search query"
-                            },
-                            "max_results": {
-                                "type": "integer",
-                                "description": "Maximum number of results to return",
-                                "default": 5
-                            }
-                        },
-                        "required": ["query"]
-                    }
-                }
-            },
+            tool_spec=_SEARCH_SPEC,
             callback=self._execute
         )
     
@@ -86,8 +134,10 @@ class DocumentSearchTool(Tool):
         """
         Execute the search through documentation.
         
-        This is a simple implementation. In a real application, you might use
-        a vector database or other search mechanism.
+        File contents are served from the processor's in-memory index, which
+        only re-reads files that changed since the last query. When the
+        processor has an embed function, keyword matches are blended with
+        semantically similar chunks.
         """
         # Extract query from tool_use
         query = tool_use.get("input", {}).get("query", "")
@@ -100,28 +150,27 @@ class DocumentSearchTool(Tool):
             }
             
         logger.info(f"Searching for query '{query}' in docs_path: '{self.docs_path}'")
-        results = []
         
-        # Simple file-based search implementation
         try:
-            for root, _, files in os.walk(self.docs_path):
-                for file in files:
-                    if file.endswith(('.md', '.txt', '.html')):
-                        file_path = os.path.join(root, file)
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                                if query.lower() in content.lower():
-                                    # Calculate a simple relevance score based on term frequency
-                                    score = content.lower().count(query.lower())
-                                    results.append({
-                                        "file": file_path,
-                                        "score": score,
-                                        "preview": content[:200] + "..." if len(content) > 200 else content
-                                    })
-                        except Exception as e:
-                            logger.warning(f"Error reading file {file_path}: {e}")
-                            print(f"Error reading file {file_path}: {e}")
+            self.processor.refresh()
+            # Calculate a simple relevance score based on term frequency
+            matches = self.processor.score_files({query.lower().encode('utf-8'): 1})
+            
+            if self.processor.embed is not None:
+                results = self._blend_semantic(query, matches, max_results)
+            else:
+                # Keep the highest scoring files; results are only built for those
+                results = []
+                for score, file_info in heapq.nlargest(max_results, matches, key=lambda x: x[0]):
+                    result = {
+                        "file": file_info["path"],
+                        "score": score,
+                        "preview": file_info["preview"]
+                    }
+                    if file_info.get("truncated"):
+                        # Only the start of oversized files is searched
+                        result["truncated"] = True
+                    results.append(result)
             
             # Check results after processing all files
             if not results:
@@ -132,13 +181,11 @@ class DocumentSearchTool(Tool):
                     "content": [{"text": "No matching documents found for your query."}]
                 }
                         
-            # Sort by relevance score and limit results
-            results = sorted(results, key=lambda x: x["score"], reverse=True)[:max_results]
             logger.info(f"Found {len(results)} matching documents for query '{query}'")
             return {
                 "toolUseId": tool_use.get("toolUseId", "unknown"),
                 "status": "success",
-                "content": [{"text": json.dumps(results, indent=2) if results else "No results found."}]
+                "content": [{"text": format_json(results)}]
             }
         except Exception as e:
             logger.error(f"Search failed for query '{query}': {str(e)}", exc_info=True)
@@ -147,6 +194,52 @@ class DocumentSearchTool(Tool):
                 "status": "error",
                 "content": [{"text": f"Search failed: {str(e)}"}]
             }
+    
+    def _blend_semantic(self, query: str, matches: List[tuple], max_results: int) -> List[Dict[str, Any]]:
+        """
+        Fuse keyword matches with the closest chunks by embedding similarity.
+        
+        Args:
+            query: The search query
+            matches: (score, file_info) pairs of files containing the query
+            max_results: Maximum number of results to return
+            
+        Returns:
+            Results scored by reciprocal rank fusion, best first (keyword
+            matches alone if semantic search fails or finds nothing at least
+            MIN_SEMANTIC_SCORE similar)
+        """
+        candidates = max(max_results * 4, 20)
+        keyword_matches = heapq.nlargest(candidates, matches, key=lambda x: x[0])
+        try:
+            # The index was refreshed just before keyword scoring
+            semantic_results = self.processor.semantic_search(
+                query, candidates, refresh=False, min_score=MIN_SEMANTIC_SCORE
+            )
+        except Exception as e:
+            # Embedding the query failed (e.g. no credentials or throttling);
+            # the keyword matches are still worth returning
+            logger.warning(f"Semantic search failed for query '{query}', using keyword matches only: {str(e)}")
+            semantic_results = []
+        scores = reciprocal_rank_fusion([
+            [file_info["path"] for _, file_info in keyword_matches],
+            [result["file"] for result in semantic_results]
+        ])
+        
+        # Prefer the matching chunk's preview when there is one
+        previews = {file_info["path"]: file_info["preview"] for _, file_info in keyword_matches}
+        previews.update({result["file"]: result["preview"] for result in semantic_results})
+        truncated = {file_info["path"] for _, file_info in keyword_matches if file_info.get("truncated")}
+        truncated.update(result["file"] for result in semantic_results if result.get("truncated"))
+        
+        results = []
+        for file_path in heapq.nlargest(max_results, scores, key=scores.get):
+            result = {"file": file_path, "score": round(scores[file_path], 4), "preview": previews[file_path]}
+            if file_path in truncated:
+                # Only the start of oversized files is searched
+                result["truncated"] = True
+            results.append(result)
+        return results
 
 
 class DocumentReaderTool(Tool):
@@ -156,27 +249,17 @@ class DocumentReaderTool(Tool):
         """Initialize the document reader tool."""
         super().__init__(
             tool_name="document_read",
-            tool_spec={
-                "name": "document_read",
-                "description": "Read the content of a specific documentation file",
-                "inputSchema": {
-                    "json": {
-                        "type": "object",
-                        "properties": {
-                            "file_path": {
-                                "type": "string",
-                                "description": "Path to the documentation file to read"
-                            }
-                        },
-                        "required": ["file_path"]
-                    }
-                }
-            },
+            tool_spec=_READ_SPEC,
             callback=self._execute
         )
     
     def _execute(self, tool_use, **kwargs) -> Dict[str, Any]:
-        """Read the content of the specified file."""
+        """
+        Read the content of the specified file.
+        
+        At most MAX_READ_BYTES are returned per call; for larger files the
+        response says where to continue from.
+        """
         # Extract file_path from tool_use
         file_path = tool_use.get("input", {}).get("file_path", "")
         if not file_path:
@@ -187,13 +270,26 @@ class DocumentReaderTool(Tool):
             }
             
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                return {
-                    "toolUseId": tool_use.get("toolUseId", "unknown"),
-                    "status": "success",
-                    "content": [{"text": f"File: {file_path}\n\n{content}"}]
-                }
+            offset = max(int(tool_use.get("input", {}).get("offset", 0) or 0), 0)
+            with open(file_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                f.seek(offset)
+                data = f.read(MAX_READ_BYTES)
+            # A character cut off at the end of a page is held back by the
+            # decoder, and the page ends where it starts so the next read
+            # picks it up whole
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            content = decoder.decode(data, final=offset + len(data) >= size)
+            end = offset + len(data) - len(decoder.getstate()[0])
+            if offset or end < size:
+                content = f"[Bytes {offset}-{end} of {size}]\n\n{content}"
+            if end < size:
+                content += f"\n\n[Truncated: call document_read again with offset={end} to continue]"
+            return {
+                "toolUseId": tool_use.get("toolUseId", "unknown"),
+                "status": "success",
+                "content": [{"text": f"File: {file_path}\n\n{content}"}]
+            }
         except Exception as e:
             return {
                 "toolUseId": tool_use.get("toolUseId", "unknown"),
@@ -202,13 +298,54 @@ class DocumentReaderTool(Tool):
             }
 
 
-def create_agent(model_id: str = "anthropic.claude-3-5-sonnet-20240620-v1:0", docs_path: str = "./docs") -> Agent:
+@lru_cache(maxsize=8)
+def get_processor(
+    docs_path: str = "./docs",
+    semantic_search: bool = False,
+    region_name: str = "us-east-1",
+    profile_name: Optional[str] = None
+) -> DocumentationProcessor:
+    """
+    Get an indexed documentation processor, shared by all agents for the same docs.
+    
+    Agents hold per-conversation state and are not shared, but the index is,
+    so creating another agent (e.g. one per session) reuses its warm caches.
+    
+    Args:
+        docs_path: The path to the documentation files
+        semantic_search: Whether to embed the documentation with Bedrock
+        region_name: AWS region used for embeddings
+        profile_name: AWS profile used for embeddings (optional)
+        
+    Returns:
+        The indexed processor
+    """
+    embed = None
+    if semantic_search:
+        embed = BedrockClient(region_name=region_name, profile_name=profile_name).embed
+    processor = DocumentationProcessor(docs_path, embed=embed)
+    index = processor.load_index()
+    logger.info(f"Indexed {len(index['files'])} documentation files from '{docs_path}'")
+    return processor
+
+
+def create_agent(
+    model_id: str = "anthropic.claude-3-5-sonnet-20240620-v1:0",
+    docs_path: str = "./docs",
+    semantic_search: bool = False,
+    region_name: str = "us-east-1",
+    profile_name: Optional[str] = None
+) -> Agent:
     """
     Create and configure the Strands agent with necessary tools.
     
     Args:
         model_id: The Bedrock model ID to use
         docs_path: The path to the documentation files
+        semantic_search: Whether to embed the documentation with Bedrock and
+            blend semantic matches into search results
+        region_name: AWS region used to embed documentation and queries
+        profile_name: AWS profile used to embed documentation and queries (optional)
         
     Returns:
         Configured Strands agent
@@ -218,10 +355,13 @@ def create_agent(model_id: str = "anthropic.claude-3-5-sonnet-20240620-v1:0", do
     # Initialize the language model with region
     llm = BedrockModel(model_id=model_id, region_name="us-east-1")
     
+    # Load (or build) the index once up front so searches are served from memory
+    processor = get_processor(docs_path, semantic_search, region_name, profile_name)
+    
     # Create tool registry and register tools
     tool_registry = ToolRegistry()
     tool_registry.register_tool(ConversationResetTool())
-    tool_registry.register_tool(DocumentSearchTool(docs_path))
+    tool_registry.register_tool(DocumentSearchTool(docs_path, processor=processor))
     tool_registry.register_tool(DocumentReaderTool())
     
     # Get the list of registered tools
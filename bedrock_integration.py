@@ -5,30 +5,96 @@ This module provides utilities for working with Amazon Bedrock.
 """
 
 import boto3
+import functools
 import json
-from typing import Dict, Any, List, Optional
+import logging
+import math
+from botocore.config import Config
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Embedding model used for semantic response caching
+DEFAULT_EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v2:0"
+
+# Cosine similarity at or above which a cached response is reused for a
+# different prompt, when semantic caching is enabled
+DEFAULT_SEMANTIC_THRESHOLD = 0.95
+
+
+@functools.lru_cache(maxsize=16)
+def _get_client(service_name: str, region_name: str, profile_name: Optional[str] = None):
+    """
+    Get a boto3 client, shared by everything using the same service, region and profile.
+    
+    Creating a session resolves credentials and endpoints, and each client
+    has its own connection pool, so both are created once and reused.
+    
+    Args:
+        service_name: AWS service name
+        region_name: AWS region name
+        profile_name: AWS profile name (optional)
+        
+    Returns:
+        The boto3 client
+    """
+    session_kwargs = {}
+    if profile_name:
+        session_kwargs["profile_name"] = profile_name
+        
+    session = boto3.Session(region_name=region_name, **session_kwargs)
+    return session.client(
+        service_name=service_name,
+        region_name=region_name,
+        config=Config(
+            max_pool_connections=50,
+            retries={"max_attempts": 3, "mode": "adaptive"}
+        )
+    )
 
 
 class BedrockClient:
     """Client for interacting with Amazon Bedrock."""
     
-    def __init__(self, region_name: str = "us-east-1", profile_name: Optional[str] = None):
+    def __init__(
+        self,
+        region_name: str = "us-east-1",
+        profile_name: Optional[str] = None,
+        cache_size: int = 128,
+        semantic_threshold: Optional[float] = None,
+        embedding_model_id: str = DEFAULT_EMBEDDING_MODEL_ID
+    ):
         """
         Initialize the Bedrock client.
         
         Args:
             region_name: AWS region name
             profile_name: AWS profile name (optional)
+            cache_size: Maximum number of responses to cache (0 disables caching)
+            semantic_threshold: Cosine similarity at or above which a cached response
+                is reused for a different prompt (optional; exact matches only if unset)
+            embedding_model_id: Bedrock model ID used to embed prompts for semantic caching
         """
-        session_kwargs = {}
-        if profile_name:
-            session_kwargs["profile_name"] = profile_name
-            
-        session = boto3.Session(region_name=region_name, **session_kwargs)
-        self.bedrock_runtime = session.client(
-            service_name="bedrock-runtime",
-            region_name=region_name
-        )
+        self.cache_size = cache_size
+        self.semantic_threshold = semantic_threshold
+        self.embedding_model_id = embedding_model_id
+        # Cached responses in least-recently-used order, keyed by
+        # (model_id, prompt, max_tokens, temperature, top_p) and holding
+        # (embedding slot or None, response text)
+        self._cache: "OrderedDict[Tuple, Tuple[Optional[int], str]]" = OrderedDict()
+        # Embeddings of cached prompts, one row per slot, so a lookup is one
+        # matrix-vector product. Each slot also records the cache key using
+        # it and the id of its (model_id, max_tokens, temperature, top_p)
+        # group, or -1 while free; rows are allocated on first use
+        self._embeddings: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[Tuple]] = [None] * cache_size
+        self._slot_groups = np.full(cache_size, -1, dtype=np.int64)
+        self._groups: Dict[Tuple, int] = {}
+        
+        self.bedrock_runtime = _get_client("bedrock-runtime", region_name, profile_name)
     
     def invoke_model(
         self, 
@@ -36,7 +102,8 @@ class BedrockClient:
         prompt: str,
         max_tokens: int = 2048,
         temperature: float = 0.7,
-        top_p: float = 0.9
+        top_p: float = 0.9,
+        cache_text: Optional[str] = None
     ) -> str:
         """
         Invoke a Bedrock model with the given prompt.
@@ -47,17 +114,159 @@ class BedrockClient:
             max_tokens: Maximum number of tokens to generate
             temperature: Temperature for sampling
             top_p: Top-p sampling parameter
+            cache_text: Text compared by embedding for semantic caching
+                (optional; defaults to the prompt)
             
         Returns:
             The model's response text
         """
+        return "".join(self.invoke_model_stream(model_id, prompt, max_tokens, temperature, top_p, cache_text))
+    
+    def invoke_model_stream(
+        self, 
+        model_id: str, 
+        prompt: str,
+        max_tokens: int = 2048,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        cache_text: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Invoke a Bedrock model and yield its response text as it is generated.
+        
+        Cached responses are yielded in a single piece.
+        
+        Args:
+            model_id: The Bedrock model ID
+            prompt: The prompt to send to the model
+            max_tokens: Maximum number of tokens to generate
+            temperature: Temperature for sampling
+            top_p: Top-p sampling parameter
+            cache_text: Text compared by embedding for semantic caching
+                (optional; defaults to the prompt)
+            
+        Yields:
+            Pieces of the model's response text
+        """
+        key = (model_id, prompt, max_tokens, temperature, top_p)
+        embedding = None
+        if self.cache_size > 0:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                yield cached[1]
+                return
+            if self.semantic_threshold is not None:
+                embedding = self._embed_for_cache(cache_text if cache_text is not None else prompt)
+                cached_response = self._semantic_lookup(key, embedding)
+                if cached_response is not None:
+                    yield cached_response
+                    return
+        
         # Handle different model providers
         if "anthropic" in model_id.lower():
-            return self._invoke_anthropic(model_id, prompt, max_tokens, temperature, top_p)
+            stream = self._invoke_anthropic(model_id, prompt, max_tokens, temperature, top_p)
         elif "amazon" in model_id.lower():
-            return self._invoke_amazon(model_id, prompt, max_tokens, temperature, top_p)
+            stream = self._invoke_amazon(model_id, prompt, max_tokens, temperature, top_p)
         else:
             raise ValueError(f"Unsupported model provider in model_id: {model_id}")
+        
+        parts = []
+        for text in stream:
+            parts.append(text)
+            yield text
+        
+        if self.cache_size > 0:
+            self._store(key, embedding, "".join(parts))
+    
+    def embed(self, text: str) -> List[float]:
+        """
+        Embed text with the configured Bedrock embedding model.
+        
+        Args:
+            text: The text to embed
+            
+        Returns:
+            The L2-normalized embedding vector
+        """
+        response = self.bedrock_runtime.invoke_model(
+            modelId=self.embedding_model_id,
+            body=json.dumps({"inputText": text})
+        )
+        
+        embedding = json.loads(response.get("body").read()).get("embedding")
+        norm = math.sqrt(sum(x * x for x in embedding)) or 1.0
+        return [x / norm for x in embedding]
+    
+    def clear_cache(self) -> None:
+        """Drop all cached responses."""
+        self._cache.clear()
+        self._slot_keys = [None] * self.cache_size
+        self._slot_groups[:] = -1
+    
+    def _embed_for_cache(self, text: str) -> Optional[np.ndarray]:
+        """Embed text for semantic caching, treating failures as a cache miss."""
+        try:
+            return np.asarray(self.embed(text), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Could not embed prompt for semantic caching: {e}")
+            return None
+    
+    def _store(self, key: Tuple, embedding: Optional[np.ndarray], response: str) -> None:
+        """
+        Cache a response, evicting the least recently used one if full.
+        
+        Args:
+            key: Cache key of the prompt
+            embedding: Normalized embedding of the prompt, if semantic caching is on
+            response: The response text
+        """
+        if len(self._cache) >= self.cache_size:
+            _, (slot, _) = self._cache.popitem(last=False)
+            if slot is not None:
+                self._slot_keys[slot] = None
+                self._slot_groups[slot] = -1
+        
+        slot = None
+        if embedding is not None:
+            if self._embeddings is None:
+                self._embeddings = np.zeros((self.cache_size, len(embedding)), dtype=np.float32)
+            # Evicting first leaves at least one slot free
+            slot = int(np.flatnonzero(self._slot_groups < 0)[0])
+            self._embeddings[slot] = embedding
+            self._slot_keys[slot] = key
+            group = (key[0], *key[2:])
+            self._slot_groups[slot] = self._groups.setdefault(group, len(self._groups))
+        self._cache[key] = (slot, response)
+    
+    def _semantic_lookup(self, key: Tuple, embedding: Optional[np.ndarray]) -> Optional[str]:
+        """
+        Find a cached response for a similar prompt with the same parameters.
+        
+        Args:
+            key: Cache key of the prompt being looked up
+            embedding: Normalized embedding of the prompt
+            
+        Returns:
+            The best cached response at or above the similarity threshold, if any
+        """
+        if embedding is None or self._embeddings is None:
+            return None
+        group = self._groups.get((key[0], *key[2:]))
+        if group is None:
+            return None
+        
+        # Embeddings are normalized, so the dot products are cosine
+        # similarities; slots that are free or cached with other
+        # parameters are ruled out
+        scores = self._embeddings @ embedding
+        scores[self._slot_groups != group] = -np.inf
+        slot = int(np.argmax(scores))
+        if scores[slot] < self.semantic_threshold:
+            return None
+        best_key = self._slot_keys[slot]
+        self._cache.move_to_end(best_key)
+        return self._cache[best_key][1]
     
     def _invoke_anthropic(
         self, 
@@ -66,8 +275,8 @@ class BedrockClient:
         max_tokens: int,
         temperature: float,
         top_p: float
-    ) -> str:
-        """Invoke an Anthropic model."""
+    ) -> Iterator[str]:
+        """Invoke an Anthropic model, yielding text deltas as they arrive."""
         request_body = {
             "anthropic_version": "bedrock-2023-05-31",
             "max_tokens": max_tokens,
@@ -81,13 +290,15 @@ class BedrockClient:
             "top_p": top_p
         }
         
-        response = self.bedrock_runtime.invoke_model(
+        response = self.bedrock_runtime.invoke_model_with_response_stream(
             modelId=model_id,
             body=json.dumps(request_body)
         )
         
-        response_body = json.loads(response.get("body").read())
-        return response_body.get("content")[0].get("text")
+        for event in response.get("body"):
+            chunk = json.loads(event["chunk"]["bytes"])
+            if chunk.get("type") == "content_block_delta":
+                yield chunk["delta"].get("text", "")
     
     def _invoke_amazon(
         self, 
@@ -96,8 +307,8 @@ class BedrockClient:
         max_tokens: int,
         temperature: float,
         top_p: float
-    ) -> str:
-        """Invoke an Amazon model."""
+    ) -> Iterator[str]:
+        """Invoke an Amazon model, yielding text as it arrives."""
         request_body = {
             "inputText": prompt,
             "textGenerationConfig": {
@@ -107,13 +318,14 @@ class BedrockClient:
             }
         }
         
-        response = self.bedrock_runtime.invoke_model(
+        response = self.bedrock_runtime.invoke_model_with_response_stream(
             modelId=model_id,
             body=json.dumps(request_body)
         )
         
-        response_body = json.loads(response.get("body").read())
-        return response_body.get("results")[0].get("outputText")
+        for event in response.get("body"):
+            chunk = json.loads(event["chunk"]["bytes"])
+            yield chunk.get("outputText", "")
 
 
 def list_available_models(region_name: str = "us-east-1", profile_name: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -127,12 +339,7 @@ def list_available_models(region_name: str = "us-east-1", profile_name: Optional
     Returns:
         List of available models
     """
-    session_kwargs = {}
-    if profile_name:
-        session_kwargs["profile_name"] = profile_name
-        
-    session = boto3.Session(region_name=region_name, **session_kwargs)
-    bedrock = session.client(service_name="bedrock", region_name=region_name)
+    bedrock = _get_client("bedrock", region_name, profile_name)
     
     response = bedrock.list_foundation_models()
     return response.get("modelSummaries", [])
@@ -5,24 +5,118 @@ This module provides utilities for processing and indexing documentation.
 """
 
 import os
+import heapq
 import json
+import mmap
 import re
-from typing import Dict, List, Any, Optional, Tuple
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Any, Optional, Sequence, Tuple, Union
 from pathlib import Path
 
+import numpy as np
+
+
+# Only the first this many bytes of a file are indexed and searched, so a
+# stray multi-gigabyte log or binary can't stall indexing or every query
+MAX_FILE_BYTES = 32 * 1024 * 1024
+
+# Files larger than this are not cached in memory; they are scanned through
+# a memory map instead
+MAX_CACHED_BYTES = 8 * 1024 * 1024
+
+# Chunk size used when scanning memory-mapped files
+SCAN_CHUNK_BYTES = 1024 * 1024
+
+# Bumped whenever the layout of the saved index changes
+INDEX_FORMAT_VERSION = 10
+
+# Name of the saved index inside the documentation directory; its extension
+# keeps iter_doc_files from picking it (or its companion files) up
+INDEX_FILENAME = ".docs_index.json"
+
+# Size and overlap, in characters, of the chunks embedded for semantic search
+# (roughly 512 tokens of English text per chunk)
+EMBED_CHUNK_CHARS = 2000
+EMBED_CHUNK_OVERLAP = 200
+
+# Query words shorter than this, or in STOPWORDS, are not searched for
+MIN_TERM_CHARS = 2
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does",
+    "for", "from", "how", "i", "in", "is", "it", "my", "of", "on", "or",
+    "should", "that", "the", "this", "to", "what", "when", "where", "which",
+    "who", "why", "will", "with", "you",
+})
+
+# Rank offset used by reciprocal rank fusion
+RRF_K = 60
+
+# Upper bound on threads used to read and process files concurrently
+MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Most embedding requests in flight at once, across all files being indexed
+EMBED_WORKERS = 8
+
 
 class DocumentationProcessor:
     """Processor for documentation files."""
     
-    def __init__(self, docs_path: str = "./docs"):
+    # First level-one markdown heading
+    _TITLE_RE = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+    # Keyword candidates: runs of word characters longer than three characters
+    _WORD_RE = re.compile(r'\w{4,}')
+    # Maximal runs of ASCII word characters; on UTF-8 bytes every other
+    # character acts as a separator
+    _TOKEN_BYTES_RE = re.compile(rb'\w+')
+    
+    def __init__(self, docs_path: str = "./docs", embed: Optional[Callable[[str], Sequence[float]]] = None):
         """
         Initialize the documentation processor.
         
         Args:
             docs_path: Path to the documentation directory
+            embed: Function returning an L2-normalized embedding for a text,
+                e.g. BedrockClient.embed (optional; enables semantic search)
         """
         self.docs_path = docs_path
+        self.embed = embed
         self.index = {}
+        # Lowercased UTF-8 file contents keyed by path, kept in memory so that
+        # queries don't have to re-read every file from disk. After load_index
+        # these are memoryviews into the saved index's memory-mapped blob file,
+        # so processes loading the same index share one copy in the page cache
+        self.contents: Dict[str, Union[bytes, memoryview]] = {}
+        # Modification time of each file when it was last processed
+        self.mtimes: Dict[str, float] = {}
+        # Per-file chunk embeddings, int8-quantized with one scale per row,
+        # and the matching (character offset, preview) of each chunk
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.vector_scales: Dict[str, np.ndarray] = {}
+        self.chunks: Dict[str, List[Tuple[int, str]]] = {}
+        # Per-file counts of every ASCII word in the lowercased contents, and
+        # the inverted postings (file position, count) built from them lazily
+        self.term_counts: Dict[str, Dict[bytes, int]] = {}
+        self._postings: Optional[Dict[bytes, np.ndarray]] = None
+        # All chunk vectors stacked into one matrix, rebuilt when files change
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_scales: Optional[np.ndarray] = None
+        self._matrix_rows: List[Tuple[str, int]] = []
+        # Incremented whenever the indexed files change, so callers caching
+        # anything derived from them can tell when to drop it
+        self.generation = 0
+        # Shared by every file being embedded; threads start on first use
+        self._embed_executor = ThreadPoolExecutor(max_workers=EMBED_WORKERS) if embed else None
+        # One processor may be shared by several agents' threads. Refreshing
+        # replaces the file list and postings that scoring indexes into by
+        # position, so applying updates and searching take turns
+        self._lock = threading.RLock()
+        # Held for a whole update. Files are read and embedded (a network
+        # round trip each) without holding `_lock`, so searches keep being
+        # answered from the index as it stands until the results are applied
+        self._update_lock = threading.RLock()
         
     def index_documentation(self) -> Dict[str, Any]:
         """
@@ -31,71 +125,293 @@ class DocumentationProcessor:
         Returns:
             Dictionary containing the index
         """
-        self.index = {
-            "files": [],
-            "keywords": {}
-        }
+        return self._update(rebuild=True)
+    
+    def refresh(self) -> Dict[str, Any]:
+        """
+        Bring the index up to date with the documentation directory.
+        
+        Only files that are new or whose modification time changed are
+        re-processed; files that no longer exist are dropped. If another
+        thread is already refreshing, the index is returned as it stands
+        rather than waiting for that refresh to finish.
+        
+        Returns:
+            Dictionary containing the index
+        """
+        return self._update(rebuild=False, wait=False)
+    
+    def _update(self, rebuild: bool, wait: bool = True) -> Dict[str, Any]:
+        """
+        Re-process new and modified files and apply the results.
+        
+        Args:
+            rebuild: Whether to re-process every file rather than only
+                those that changed
+            wait: Whether to wait for an update already in progress;
+                otherwise the current index is returned straight away
+            
+        Returns:
+            Dictionary containing the index
+        """
+        if not self._update_lock.acquire(blocking=wait):
+            return self.index
+        try:
+            with self._lock:
+                rebuild = rebuild or not self.index
+                known = {} if rebuild else {info["path"]: info for info in self.index["files"]}
+                mtimes = {} if rebuild else dict(self.mtimes)
+            
+            # Ensure the docs directory exists
+            if not os.path.exists(self.docs_path):
+                os.makedirs(self.docs_path)
+            
+            files = []
+            stale = []
+            for entry in iter_doc_files(self.docs_path):
+                file_path = entry.path
+                file_info = known.pop(file_path, None)
+                try:
+                    if file_info is None or entry.stat().st_mtime != mtimes.get(file_path):
+                        stale.append(file_path)
+                        file_info = None
+                except OSError as e:
+                    print(f"Error processing file {file_path}: {e}")
+                    stale.append(file_path)
+                    continue
+                files.append((file_path, file_info))
+            processed = dict(zip(stale, self._process_files(stale)))
+            
+            with self._lock:
+                if rebuild:
+                    self.contents = {}
+                    self.mtimes = {}
+                    self.vectors = {}
+                    self.vector_scales = {}
+                    self.chunks = {}
+                    self.term_counts = {}
+                    self._matrix = None
+                for file_path, result in processed.items():
+                    if result is None:
+                        self._forget(file_path)
+                    else:
+                        self._apply_file(file_path, *result)
+                # Anything left in `known` was deleted since the last refresh
+                for file_path in known:
+                    self._forget(file_path)
+                
+                if rebuild or processed or known:
+                    files = [
+                        info if info is not None else processed[path][0]
+                        for path, info in files
+                        if info is not None or processed.get(path) is not None
+                    ]
+                    if rebuild:
+                        self.index = {"files": files, "keywords": {}}
+                    else:
+                        self.index["files"] = files
+                    self._build_keyword_map()
+                    self.generation += 1
+                return self.index
+        finally:
+            self._update_lock.release()
+    
+    def _process_files(self, file_paths: List[str]) -> List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]]:
+        """
+        Process several files, overlapping their reads on a thread pool.
+        
+        Args:
+            file_paths: Paths of the files to process
+            
+        Returns:
+            What _process_file returned for each path in order, or None where
+            processing failed
+        """
+        def process(file_path: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+            try:
+                return self._process_file(file_path)
+            except Exception as e:
+                print(f"Error processing file {file_path}: {e}")
+                return None
         
-        # Ensure the docs directory exists
-        if not os.path.exists(self.docs_path):
-            os.makedirs(self.docs_path)
-            
-        # Walk through the docs directory
-        for root, _, files in os.walk(self.docs_path):
-            for file in files:
-                if file.endswith(('.md', '.txt', '.html')):
-                    file_path = os.path.join(root, file)
-                    try:
-                        # Process the file
-                        file_info, keywords = self._process_file(file_path)
-                        
-                        # Add to the index
-                        self.index["files"].append(file_info)
-                        
-                        # Update keywords
-                        for keyword in keywords:
-                            if keyword not in self.index["keywords"]:
-                                self.index["keywords"][keyword] = []
-                            self.index["keywords"][keyword].append(file_info["id"])
-                    except Exception as e:
-                        print(f"Error processing file {file_path}: {e}")
-        
-        return self.index
-    
-    def _process_file(self, file_path: str) -> Tuple[Dict[str, Any], List[str]]:
-        """
-        Process a single documentation file.
+        if len(file_paths) < 2:
+            return [process(file_path) for file_path in file_paths]
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(file_paths))) as executor:
+            return list(executor.map(process, file_paths))
+    
+    def _forget(self, file_path: str) -> None:
+        """Drop everything cached for a file."""
+        self.contents.pop(file_path, None)
+        self.mtimes.pop(file_path, None)
+        self.term_counts.pop(file_path, None)
+        self._forget_vectors(file_path)
+    
+    def _forget_vectors(self, file_path: str) -> None:
+        """Drop a file's chunk embeddings."""
+        if self.vectors.pop(file_path, None) is not None:
+            self._matrix = None
+        self.vector_scales.pop(file_path, None)
+        self.chunks.pop(file_path, None)
+    
+    def count(self, file_path: str, needle: bytes) -> int:
+        """
+        Count occurrences of a lowercased needle in an indexed file.
+        
+        Args:
+            file_path: Path to an indexed file
+            needle: Lowercased UTF-8 encoded search term
+            
+        Returns:
+            Number of non-overlapping occurrences
+        """
+        if not needle:
+            return 0
+        blob = self.contents.get(file_path)
+        if blob is None:
+            return self._count_mapped(file_path, [needle])[0]
+        if isinstance(blob, bytes):
+            return blob.count(needle)
+        return len(re.compile(re.escape(needle)).findall(blob))
+    
+    def _count_mapped(self, file_path: str, needles: Sequence[bytes]) -> List[int]:
+        """
+        Count needles in a file too large to cache by scanning it in chunks.
+        
+        Each chunk is lowercased once and searched for every needle, rather
+        than the whole file being lowercased again per needle.
+        """
+        counts = [0] * len(needles)
+        previous = b""
+        with open(file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    # Let the kernel read ahead aggressively for the linear scan
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                limit = min(len(mm), MAX_FILE_BYTES)
+                # Copying and lowercasing each chunk costs a few memcpys, but
+                # bytes.count over the result is still around four times
+                # faster than a re.IGNORECASE scan of the mapping in place
+                start = 0
+                while start < limit:
+                    end = min(start + SCAN_CHUNK_BYTES, limit)
+                    if end < limit:
+                        # Move the cut back to the start of a character, so a
+                        # multi-byte character isn't split across two chunks
+                        # (and dropped from both when they are decoded)
+                        cut = end
+                        while cut > end - 3 and 0x80 <= mm[cut] < 0xC0:
+                            cut -= 1
+                        if cut > start:
+                            end = cut
+                    chunk = _lower(mm[start:end])
+                    for i, needle in enumerate(needles):
+                        # Prefix the last len(needle) - 1 bytes of the previous
+                        # chunk so that matches straddling the boundary are
+                        # found exactly once
+                        edge = len(needle) - 1
+                        if previous and edge:
+                            counts[i] += (previous[-edge:] + chunk).count(needle)
+                        else:
+                            counts[i] += chunk.count(needle)
+                    previous = chunk
+                    start = end
+        return counts
+    
+    def _build_keyword_map(self) -> None:
+        """Rebuild the keyword -> file id map from the indexed files."""
+        keywords = {}
+        for file_info in self.index["files"]:
+            for keyword in file_info["keywords"]:
+                keywords.setdefault(keyword, []).append(file_info["id"])
+        self.index["keywords"] = keywords
+        # Postings refer to files by position, which may have changed
+        self._postings = None
+    
+    def _build_postings(self) -> Dict[bytes, np.ndarray]:
+        """Invert the per-file term counts into word -> (file position, count) rows."""
+        if self._postings is None:
+            rows = {}
+            for position, file_info in enumerate(self.index["files"]):
+                for word, n in self.term_counts.get(file_info["path"], {}).items():
+                    rows.setdefault(word, []).append((position, n))
+            self._postings = {
+                word: np.array(pairs, dtype=np.int32) for word, pairs in rows.items()
+            }
+        return self._postings
+    
+    def _word_counts(self, fragment: bytes) -> np.ndarray:
+        """
+        Count a run of word characters in every file using the postings.
+        
+        Args:
+            fragment: Lowercased ASCII word characters
+            
+        Returns:
+            Occurrences of the fragment in each file, by position in the index
+        """
+        postings = self._build_postings()
+        counts = np.zeros(len(self.index["files"]), dtype=np.int64)
+        for word in [word for word in postings if fragment in word]:
+            rows = postings[word]
+            # A file appears at most once per word, so plain fancy indexing
+            # accumulates correctly
+            counts[rows[:, 0]] += rows[:, 1].astype(np.int64) * word.count(fragment)
+        return counts
+    
+    def _process_file(self, file_path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Read, tokenize and embed a single documentation file.
+        
+        Only reads the processor's state, so it can run without the lock;
+        _apply_file stores the results.
         
         Args:
             file_path: Path to the file
             
         Returns:
-            Tuple of (file_info, keywords)
+            Tuple of (file_info, data for _apply_file)
         """
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        with open(file_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if hasattr(os, "posix_fadvise"):
+                # The whole file is read front to back; ask for full readahead
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            # Reads this large bypass the 8 KiB buffer and go straight to read(2)
+            raw = f.read(MAX_FILE_BYTES)
+        truncated = stat.st_size > MAX_FILE_BYTES
+        if truncated:
+            print(f"Only indexing the first {MAX_FILE_BYTES} of {stat.st_size} bytes of {file_path}")
+            # The cut may fall inside a multi-byte character
+            content = raw.decode('utf-8', errors='ignore')
+        else:
+            content = raw.decode('utf-8')
+        if raw.isascii():
+            # bytes.lower() only folds A-Z, which is all ASCII text needs,
+            # and skips the Unicode casing tables entirely
+            blob = raw.lower()
+            term_counts = Counter(self._TOKEN_BYTES_RE.findall(blob))
+            # Every maximal run of four or more word characters
+            word_freq = Counter({word: n for word, n in term_counts.items() if len(word) >= 4})
+        else:
+            # Reuse the decoded text rather than decoding the bytes again
+            content_lower = content.lower()
+            blob = content_lower.encode('utf-8')
+            term_counts = Counter(self._TOKEN_BYTES_RE.findall(blob))
+            word_freq = Counter(self._WORD_RE.findall(content_lower))
             
         # Extract title
         title = os.path.basename(file_path)
         if file_path.endswith('.md'):
             # Try to extract title from markdown
-            title_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
+            title_match = self._TITLE_RE.search(content)
             if title_match:
                 title = title_match.group(1)
         
         # Generate a simple ID
         file_id = os.path.relpath(file_path, self.docs_path).replace('/', '_').replace('\\', '_')
         
-        # Extract keywords (simple implementation)
-        words = re.findall(r'\b\w+\b', content.lower())
-        word_freq = {}
-        for word in words:
-            if len(word) > 3:  # Ignore short words
-                word_freq[word] = word_freq.get(word, 0) + 1
-                
         # Get top keywords
-        keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:20]
-        keywords = [k for k, _ in keywords]
+        keywords = [k.decode('ascii') if isinstance(k, bytes) else k for k, _ in word_freq.most_common(20)]
         
         # Create file info
         file_info = {
@@ -103,15 +419,201 @@ class DocumentationProcessor:
             "path": file_path,
             "title": title,
             "size": len(content),
-            "modified": os.path.getmtime(file_path)
+            "modified": stat.st_mtime,
+            "truncated": truncated,
+            "keywords": keywords,
+            "preview": content[:200] + "..." if len(content) > 200 else content
+        }
+        data = {
+            "term_counts": term_counts,
+            "blob": blob if len(raw) <= MAX_CACHED_BYTES else None,
+            "embedding": self._embed_file(file_path, content) if self.embed is not None else None
         }
+        return file_info, data
+    
+    def _apply_file(self, file_path: str, file_info: Dict[str, Any], data: Dict[str, Any]) -> None:
+        """
+        Store what _process_file produced for a file; called with the lock held.
+        
+        Args:
+            file_path: Path to the file
+            file_info: The file's info
+            data: The file's term counts, contents and embeddings
+        """
+        self.mtimes[file_path] = file_info["modified"]
+        self.term_counts[file_path] = data["term_counts"]
+        if data["blob"] is not None:
+            self.contents[file_path] = data["blob"]
+        else:
+            self.contents.pop(file_path, None)
+        # Without new embeddings (none requested, or embedding failed) the
+        # old ones would otherwise be saved with the index and served by a
+        # later semantic load
+        self._forget_vectors(file_path)
+        if data["embedding"] is not None:
+            vectors, scales, chunks = data["embedding"]
+            self.vectors[file_path], self.vector_scales[file_path] = vectors, scales
+            self.chunks[file_path] = chunks
+            self._matrix = None
+    
+    def _embed_file(self, file_path: str, content: str) -> Optional[Tuple[np.ndarray, np.ndarray, List[Tuple[int, str]]]]:
+        """
+        Split a file into overlapping chunks and embed each one.
+        
+        Args:
+            file_path: Path to the file
+            content: The file's text
+            
+        Returns:
+            The quantized chunk vectors, their scales and each chunk's
+            (offset, preview), or None if there was nothing to embed or
+            embedding failed
+        """
+        step = EMBED_CHUNK_CHARS - EMBED_CHUNK_OVERLAP
+        chunks = []
+        for offset in range(0, max(len(content) - EMBED_CHUNK_OVERLAP, 1), step):
+            text = content[offset:offset + EMBED_CHUNK_CHARS]
+            if text.strip():
+                chunks.append((offset, text))
+        if not chunks:
+            return None
+        try:
+            vectors = np.array(self._embed_texts([text for _, text in chunks]), dtype=np.float32)
+        except Exception as e:
+            print(f"Error embedding file {file_path}: {e}")
+            return None
+        vectors, scales = _quantize(vectors)
+        previews = [
+            (offset, text[:200] + "..." if len(text) > 200 else text)
+            for offset, text in chunks
+        ]
+        return vectors, scales, previews
+    
+    def _embed_texts(self, texts: List[str]) -> List[Sequence[float]]:
+        """
+        Embed several texts, overlapping the requests.
+        
+        The embedding API takes one text per request, so the chunks of every
+        file being processed share one pool of EMBED_WORKERS threads, which
+        also caps the request rate across the whole corpus.
+        """
+        return list(self._embed_executor.map(self.embed, texts))
+    
+    def _vector_matrix(self) -> Optional[np.ndarray]:
+        """Stack all chunk vectors into one matrix, remembering each row's origin."""
+        if self._matrix is None and self.vectors:
+            paths = [info["path"] for info in self.index["files"] if info["path"] in self.vectors]
+            self._matrix = np.vstack([self.vectors[path] for path in paths])
+            self._matrix_scales = np.concatenate([self.vector_scales[path] for path in paths])
+            self._matrix_rows = [
+                (path, i) for path in paths for i in range(len(self.vectors[path]))
+            ]
+        return self._matrix
+    
+    def score_files(self, terms: Dict[bytes, int], require_all: bool = False) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Score every indexed file by how often the given terms occur in it.
+        
+        A file's score is the weighted sum of each term's occurrence count,
+        each term counted on its own as a substring, so overlapping terms
+        (say "doc" and "docs") are both counted at every place they occur.
+        By default any file containing at least one term matches; with
+        require_all, only files containing every term do.
         
-        return file_info, keywords
+        Terms made only of ASCII word characters can't span a separator, so
+        their count in a file is the sum of their counts in the file's words.
+        Those are scored from the postings with one vectorized add per
+        matching word, without touching file contents. Any other terms are
+        counted per file: a single term is a bytes.count, and terms that
+        can't overlap share one regex pass, which then gives the same counts.
+        Files are only scanned if the postings show they contain every run of
+        word characters in some term (every term, with require_all), so most
+        files that can't match are never read.
+        
+        Args:
+            terms: Lowercased UTF-8 encoded terms mapped to their weight
+            require_all: Whether a file must contain every term to match
+            
+        Returns:
+            (score, file_info) for every matching file, in index order
+        """
+        with self._lock:
+            terms = {term: n for term, n in terms.items() if term}
+            if not terms:
+                return []
+            files = self.index["files"]
+            
+            word_terms = {term: n for term, n in terms.items() if self._TOKEN_BYTES_RE.fullmatch(term)}
+            scores = np.zeros(len(files), dtype=np.int64)
+            # With require_all, files missing any word term are ruled out
+            has_all = np.ones(len(files), dtype=bool)
+            for term, n in word_terms.items():
+                counts = self._word_counts(term)
+                scores += counts * n
+                if require_all:
+                    has_all &= counts > 0
+            terms = {term: n for term, n in terms.items() if term not in word_terms}
+            if not terms:
+                return [(int(scores[i]), files[i]) for i in np.flatnonzero((scores > 0) & has_all)]
+            
+            # Each run of word characters in an occurrence of a term lies inside
+            # one of the file's words, so a file lacking any run can't match
+            candidates = has_all.copy() if require_all else np.zeros(len(files), dtype=bool)
+            for term in terms:
+                present = np.ones(len(files), dtype=bool)
+                for run in set(self._TOKEN_BYTES_RE.findall(term)):
+                    present &= self._word_counts(run) > 0
+                if require_all:
+                    candidates &= present
+                else:
+                    candidates |= present
+            
+            pattern = _terms_pattern(terms)
+            single = next(iter(terms)) if len(terms) == 1 else None
+            # memoryview has no count(), so shared blobs are scanned with a literal
+            # regex, which runs at the same speed
+            single_pattern = re.compile(re.escape(single)) if single is not None else None
+            contents = self.contents
+            
+            matches = []
+            for position, file_info in enumerate(files):
+                if not candidates[position]:
+                    if scores[position] > 0 and not require_all:
+                        matches.append((int(scores[position]), file_info))
+                    continue
+                file_path = file_info["path"]
+                blob = contents.get(file_path)
+                if blob is None:
+                    counts = self._count_mapped(file_path, list(terms))
+                elif single is not None:
+                    if isinstance(blob, bytes):
+                        counts = [blob.count(single)]
+                    else:
+                        counts = [len(single_pattern.findall(blob))]
+                elif pattern is not None:
+                    # Find every term in a single pass over the content
+                    hits = Counter(pattern.findall(blob))
+                    counts = [hits[term] for term in terms]
+                else:
+                    counts = [self.count(file_path, term) for term in terms]
+                if require_all and not all(counts):
+                    continue
+                score = sum(count * n for count, n in zip(counts, terms.values()))
+                score += int(scores[position])
+                if score > 0:
+                    matches.append((score, file_info))
+            return matches
     
     def search(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
         """
         Search the documentation.
         
+        The query's words are its terms, leaving out stopwords and single
+        characters, which occur in nearly every file and would otherwise
+        outweigh the words that matter. Files containing every term are
+        preferred; only if there are none do files containing some of them
+        match.
+        
         Args:
             query: Search query
             max_results: Maximum number of results to return
@@ -119,67 +621,427 @@ class DocumentationProcessor:
         Returns:
             List of search results
         """
-        if not self.index:
-            self.index_documentation()
+        self.refresh()
             
+        # Score based on term frequency
+        # Sentence punctuation around a word isn't part of what's searched for
+        words = [word.strip('.,;:!?"\'()') for word in query.lower().split()]
+        words = [word for word in words if word]
+        query_terms = Counter(
+            word.encode('utf-8') for word in words
+            if len(word) >= MIN_TERM_CHARS and word not in STOPWORDS
+        )
+        if not query_terms:
+            # A query made only of stopwords still searches for them
+            query_terms = Counter(word.encode('utf-8') for word in words)
+        matches = self.score_files(query_terms, require_all=True)
+        if not matches and len(query_terms) > 1:
+            matches = self.score_files(query_terms)
+                
+        # Keep the highest scoring files; results are only built for those
         results = []
-        query_terms = query.lower().split()
+        for score, file_info in heapq.nlargest(max_results, matches, key=lambda x: x[0]):
+            result = {
+                "file": file_info["path"],
+                "title": file_info["title"],
+                "score": score,
+                "preview": file_info["preview"]
+            }
+            if file_info.get("truncated"):
+                result["truncated"] = True
+            results.append(result)
+        return results
+    
+    def semantic_search(
+        self,
+        query: str,
+        max_results: int = 5,
+        refresh: bool = True,
+        min_score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the documentation by embedding similarity.
         
-        # Check each file
-        for file_info in self.index["files"]:
-            score = 0
-            file_path = file_info["path"]
+        Each file is scored by its best matching chunk. Requires an embed
+        function; returns no results without one.
+        
+        Args:
+            query: Search query
+            max_results: Maximum number of results to return
+            refresh: Whether to bring the index up to date first (callers
+                that just refreshed it can skip the directory scan)
+            min_score: Lowest cosine similarity a file's best chunk may have
+                to be returned (optional)
             
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read().lower()
-                    
-                # Score based on term frequency
-                for term in query_terms:
-                    score += content.count(term)
-                    
-                # If any term appears, add to results
-                if score > 0:
-                    results.append({
-                        "file": file_path,
-                        "title": file_info["title"],
-                        "score": score,
-                        "preview": content[:200] + "..." if len(content) > 200 else content
-                    })
-            except Exception as e:
-                print(f"Error searching file {file_path}: {e}")
-                
-        # Sort by relevance score and limit results
-        results = sorted(results, key=lambda x: x["score"], reverse=True)[:max_results]
+        Returns:
+            List of search results, best first
+        """
+        if self.embed is None or max_results <= 0:
+            return []
+        if refresh:
+            # Re-embedding changed files happens outside the lock
+            self.refresh()
+        with self._lock:
+            matrix = self._vector_matrix()
+            if matrix is None:
+                return []
+            # Updates replace these rather than modify them, so the query can
+            # be embedded (a network round trip) without holding the lock
+            scales, rows = self._matrix_scales, self._matrix_rows
+            chunks = dict(self.chunks)
+            infos = {info["path"]: info for info in self.index["files"]}
+        
+        query_vector = np.asarray(self.embed(query), dtype=np.float32)
+        # Rows are normalized before quantization, so one matrix-vector
+        # product rescaled per row gives every cosine similarity. `matrix @ v`
+        # would first copy the whole int8 matrix to float32; einsum reads the
+        # int8 rows as they are, moving a quarter of the bytes
+        similarities = np.einsum('ij,j->i', matrix, query_vector) * scales
+        
+        # Rows below the floor can't be returned, so they are never ordered
+        eligible = len(similarities)
+        if min_score is not None:
+            eligible = int(np.count_nonzero(similarities >= min_score))
+            if eligible == 0:
+                return []
+        
+        # Only the best rows need ordering. A file can own several of them,
+        # so widen the partition until it spans enough distinct files
+        k = min(max_results, eligible)
+        while True:
+            top = np.argpartition(-similarities, k - 1)[:k] if k < len(similarities) else np.arange(k)
+            best = {}
+            for row in top[np.argsort(-similarities[top], kind='stable')]:
+                best.setdefault(rows[row][0], row)
+            if len(best) >= max_results or k == eligible:
+                break
+            k = min(k * 4, eligible)
+        
+        results = []
+        for file_path, row in list(best.items())[:max_results]:
+            offset, preview = chunks[file_path][rows[row][1]]
+            result = {
+                "file": file_path,
+                "title": infos[file_path]["title"],
+                "score": float(similarities[row]),
+                "offset": offset,
+                "preview": preview
+            }
+            if infos[file_path].get("truncated"):
+                result["truncated"] = True
+            results.append(result)
         return results
     
-    def save_index(self, index_path: str = "docs_index.json") -> None:
+    def save_index(self, index_path: Optional[str] = None) -> None:
         """
-        Save the index to a file.
+        Save the index to a file, with cached file contents and embeddings
+        alongside it.
+        
+        The contents are concatenated into `<index_path>.<save id>.blobs` and
+        the chunk vectors stacked into `<index_path>.<save id>.vectors.npy` so
+        that load_index can memory-map them. All files are written to
+        temporary names and renamed into place, so processes still mapping the
+        old files keep a consistent view.
+        
+        Both files get new names on every save rather than replacing the old
+        ones, which may still be mapped, by this process or an agent sharing
+        the index; Windows refuses to replace or delete a mapped file. Files
+        of earlier saves are removed afterwards where possible, and on Windows
+        any still mapped are left for a later save to clean up.
         
         Args:
-            index_path: Path to save the index
+            index_path: Path to save the index (defaults to INDEX_FILENAME in
+                the documentation directory)
         """
         if not self.index:
             self.index_documentation()
+        with self._lock:
+            index_path = index_path or self._index_path()
+            
+            save_id = uuid.uuid4().hex[:16]
+            blob_offsets = {}
+            blobs_path = f"{index_path}.{save_id}.blobs"
+            with open(blobs_path + ".tmp", 'wb') as f:
+                position = 0
+                for file_path, blob in self.contents.items():
+                    f.write(blob)
+                    blob_offsets[file_path] = (position, position + len(blob))
+                    position += len(blob)
+            
+            # Rows of the stacked matrix belonging to each file
+            vector_offsets = {}
+            vectors_path = None
+            matrix = self._vector_matrix()
+            if matrix is not None:
+                vectors_path = f"{index_path}.{save_id}.vectors.npy"
+                for row, (file_path, _) in enumerate(self._matrix_rows):
+                    start, _ = vector_offsets.get(file_path, (row, row))
+                    vector_offsets[file_path] = (start, row + 1)
+                with open(vectors_path + ".tmp", 'wb') as f:
+                    np.save(f, matrix)
             
-        with open(index_path, 'w', encoding='utf-8') as f:
-            json.dump(self.index, f, indent=2)
+            # Plain JSON, so loading an index found in a shared documentation
+            # directory can't run code the way unpickling could. Term-count
+            # words are runs of ASCII word characters, so they decode as ASCII
+            state = {
+                "version": INDEX_FORMAT_VERSION,
+                "docs_path": self.docs_path,
+                "index": self.index,
+                "blobs_file": os.path.basename(blobs_path),
+                "blob_offsets": blob_offsets,
+                "mtimes": self.mtimes,
+                "vectors_file": os.path.basename(vectors_path) if vectors_path else None,
+                "vector_offsets": vector_offsets,
+                "vector_scales": {
+                    file_path: scales.tolist() for file_path, scales in self.vector_scales.items()
+                },
+                "chunks": self.chunks,
+                "term_counts": {
+                    file_path: {word.decode('ascii'): n for word, n in counts.items()}
+                    for file_path, counts in self.term_counts.items()
+                }
+            }
+            with open(index_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(blobs_path + ".tmp", blobs_path)
+            if matrix is not None:
+                os.replace(vectors_path + ".tmp", vectors_path)
+            os.replace(index_path + ".tmp", index_path)
+            _remove_stale_files(index_path, ".blobs", keep=blobs_path)
+            _remove_stale_files(index_path, ".vectors.npy", keep=vectors_path)
     
-    def load_index(self, index_path: str = "docs_index.json") -> Dict[str, Any]:
+    def load_index(self, index_path: Optional[str] = None) -> Dict[str, Any]:
         """
         Load the index from a file.
         
+        The loaded index is revalidated against the documentation directory,
+        so only files added or modified since it was saved are re-read. An
+        index saved for a different documentation path is rebuilt instead.
+        
         Args:
-            index_path: Path to the index file
+            index_path: Path to the index file (defaults to INDEX_FILENAME in
+                the documentation directory)
             
         Returns:
             The loaded index
         """
-        if os.path.exists(index_path):
-            with open(index_path, 'r', encoding='utf-8') as f:
-                self.index = json.load(f)
-        else:
-            self.index_documentation()
+        # Kept out of the way of refreshes until the loaded state is in place
+        with self._update_lock:
+            index_path = index_path or self._index_path()
+            if os.path.exists(index_path):
+                try:
+                    with open(index_path, 'r', encoding='utf-8') as f:
+                        state = json.load(f)
+                    if state.get("version") != INDEX_FORMAT_VERSION:
+                        raise ValueError(f"unsupported index format {state.get('version')!r}")
+                    if state["docs_path"] != self.docs_path:
+                        # Indexed file paths are built from the docs path
+                        raise ValueError(f"index was built for docs path {state['docs_path']!r}")
+                    blobs = _map_file(_companion_path(index_path, state["blobs_file"]))
+                    vector_offsets = state["vector_offsets"]
+                    matrix = None
+                    if vector_offsets:
+                        # Only the pages a query touches are read from disk
+                        matrix = np.load(
+                            _companion_path(index_path, state["vectors_file"]),
+                            mmap_mode='r',
+                            allow_pickle=False
+                        )
+                except Exception as e:
+                    print(f"Error loading index {index_path}: {e}")
+                    return self.index_documentation()
+                with self._lock:
+                    self.index = state["index"]
+                    self.contents = {
+                        file_path: blobs[start:end]
+                        for file_path, (start, end) in state["blob_offsets"].items()
+                    }
+                    self.mtimes = state["mtimes"]
+                    self.vectors = {
+                        file_path: matrix[start:end]
+                        for file_path, (start, end) in vector_offsets.items()
+                    }
+                    self.vector_scales = {
+                        file_path: np.array(scales, dtype=np.float32)
+                        for file_path, scales in state["vector_scales"].items()
+                    }
+                    self.chunks = {
+                        file_path: [tuple(chunk) for chunk in chunks]
+                        for file_path, chunks in state["chunks"].items()
+                    }
+                    self.term_counts = {
+                        file_path: {word.encode('ascii'): n for word, n in counts.items()}
+                        for file_path, counts in state["term_counts"].items()
+                    }
+                    self._postings = None
+                    self.generation += 1
+                    # Search the mapped matrix directly until a file's vectors change
+                    self._matrix = matrix
+                    if matrix is not None:
+                        paths = sorted(vector_offsets, key=lambda path: vector_offsets[path][0])
+                        self._matrix_scales = np.concatenate([self.vector_scales[path] for path in paths])
+                        self._matrix_rows = [
+                            (path, i) for path in paths for i in range(len(self.vectors[path]))
+                        ]
+                    if self.embed is not None:
+                        # Files indexed without embeddings need processing again
+                        for file_path in set(self.mtimes) - set(self.vectors):
+                            self.mtimes.pop(file_path)
+                return self.refresh()
             
-        return self.index
+            return self.index_documentation()
+    
+    def _index_path(self) -> str:
+        """Default location of the saved index, inside the documentation directory."""
+        return os.path.join(self.docs_path, INDEX_FILENAME)
+
+
+def iter_doc_files(root: str) -> Iterator[os.DirEntry]:
+    """
+    Yield directory entries for all documentation files under a directory.
+    
+    Uses os.scandir so file types come from the directory listing itself
+    rather than a separate stat call per entry, and walks the tree with an
+    explicit stack rather than nested generators.
+    
+    Args:
+        root: Directory to scan
+    """
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    # Like os.walk, don't descend into symlinked directories
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(('.md', '.txt', '.html')) and not entry.is_dir():
+                        yield entry
+        except OSError:
+            # Mirror os.walk, which silently skips unreadable directories
+            continue
+
+
+def _lower(data: bytes) -> bytes:
+    """
+    Lowercase UTF-8 bytes, using the fast bytes path for ASCII content.
+    
+    Most documentation is pure ASCII, where bytes.lower() folds case in a
+    single C pass; only other content goes through str.lower().
+    """
+    if data.isascii():
+        return data.lower()
+    return data.decode('utf-8', errors='ignore').lower().encode('utf-8')
+
+
+def _companion_path(index_path: str, file_name: str) -> str:
+    """
+    Resolve a file named in a saved index, which must sit beside it.
+    
+    Args:
+        index_path: Path of the index
+        file_name: Name of the companion file as recorded in the index
+        
+    Returns:
+        Path of the companion file
+    """
+    if os.path.basename(file_name) != file_name or not file_name.startswith(os.path.basename(index_path) + "."):
+        raise ValueError(f"unexpected index file name {file_name!r}")
+    return os.path.join(os.path.dirname(index_path), file_name)
+
+
+def _remove_stale_files(index_path: str, suffix: str, keep: Optional[str]) -> None:
+    """
+    Delete companion files of an index left over from earlier saves.
+    
+    Files another process still has mapped can't be deleted on Windows;
+    they are skipped and removed by a later save.
+    
+    Args:
+        index_path: Path of the index
+        suffix: Suffix of the companion files, e.g. ".blobs"
+        keep: Path of the file the index now refers to, if any
+    """
+    directory = os.path.dirname(index_path) or "."
+    prefix = os.path.basename(index_path) + "."
+    keep_name = os.path.basename(keep) if keep else None
+    for entry in os.scandir(directory):
+        if entry.name.startswith(prefix) and entry.name.endswith(suffix) and entry.name != keep_name:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def _map_file(file_path: str) -> memoryview:
+    """Memory-map a file read-only, returning a view of its bytes."""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap can't map an empty file
+            return memoryview(b"")
+        # The mapping stays valid after the file is closed
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def _quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize embedding rows to int8 with a symmetric scale per row.
+    
+    int8 storage is a quarter the size of float32, which keeps large indexes
+    small in memory and on disk at a cosine error of around 1e-3.
+    
+    Args:
+        vectors: Float embedding matrix, one row per chunk
+        
+    Returns:
+        Tuple of (int8 matrix, float32 scale per row)
+    """
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> Dict[str, float]:
+    """
+    Blend several rankings with reciprocal rank fusion.
+    
+    Args:
+        rankings: Lists of items, each ordered best first
+        k: Rank offset damping the weight of top positions
+        
+    Returns:
+        Fused score for every ranked item (higher is better)
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def _terms_pattern(terms) -> Optional["re.Pattern[bytes]"]:
+    """
+    Compile search terms into a single alternation for one-pass scanning.
+    
+    Search scores count each term separately. A regex scan reports
+    non-overlapping matches across all terms, which only agrees with that
+    when no term overlaps another (one containing the other, or a suffix of
+    one being a prefix of another), so overlapping terms get no pattern and
+    the caller falls back to counting them one by one.
+    
+    Args:
+        terms: Distinct lowercased UTF-8 encoded search terms
+        
+    Returns:
+        The compiled pattern, or None if the terms should be counted one by one
+    """
+    if len(terms) < 2:
+        return None
+    for a in terms:
+        for b in terms:
+            if a == b:
+                continue
+            if a in b or any(a[-k:] == b[:k] for k in range(1, min(len(a), len(b)))):
+                return None
+    return re.compile(b'|'.join(re.escape(term) for term in terms))
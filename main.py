@@ -9,13 +9,9 @@ import argparse
 import logging
 from typing import Optional
 
-from strands.agent.agent import Agent
-from strands.models.bedrock import BedrockModel
-from strands.tools.registry import ToolRegistry
-
-from app import DocumentSearchTool, DocumentReaderTool, create_agent
-from mcp_integration import register_mcp_tools
-from docs_processor import DocumentationProcessor
+# Strands, boto3 and NumPy take a while to import, so the application
+# modules are imported where they're first needed; --help and bad
+# arguments return without loading any of them
 
 # Configure logging
 logging.basicConfig(
@@ -24,23 +20,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Consecutive failed turns after which the agent is rebuilt regardless, in
+# case its conversation state is what keeps failing
+MAX_CONSECUTIVE_ERRORS = 3
+
 
 def validate_messages(messages):
     """Validate messages to ensure no empty content blocks are sent to Bedrock."""
     if not messages:
         return messages
         
-    for i, msg in enumerate(messages):
-        if "content" in msg and isinstance(msg["content"], list):
-            for j, content in enumerate(msg["content"]):
-                if "text" in content and (content["text"] is None or content["text"] == ""):
-                    # Replace empty text with placeholder
-                    messages[i]["content"][j]["text"] = "[No content]"
+    for msg in messages:
+        content = msg.get("content")
+        if not isinstance(content, list):
+            continue
+        for block in content:
+            # Only text blocks; tool use and result blocks have no "text" key
+            if "text" in block and not block["text"]:
+                # Replace empty text with placeholder
+                block["text"] = "[No content]"
     return messages
 
 
-def parse_args():
-    """Parse command line arguments."""
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line argument parser."""
     parser = argparse.ArgumentParser(description="Strands Documentation Assistant")
     parser.add_argument(
         "--docs-path", 
@@ -65,6 +68,11 @@ def parse_args():
         action="store_true",
         help="Index documentation before starting"
     )
+    parser.add_argument(
+        "--semantic", 
+        action="store_true",
+        help="Embed documentation with Bedrock and blend semantic matches into search"
+    )
     parser.add_argument(
         "--region", 
         type=str, 
@@ -82,7 +90,48 @@ def parse_args():
         action="store_true",
         help="Test configuration without initializing Bedrock"
     )
-    return parser.parse_args()
+    # Used by test_setup.py: checks --help and runs a dry run in one process
+    parser.add_argument(
+        "--selftest", 
+        action="store_true",
+        help=argparse.SUPPRESS
+    )
+    return parser
+
+
+def parse_args():
+    """Parse command line arguments."""
+    return build_parser().parse_args()
+
+
+def dry_run(docs_path: str) -> None:
+    """
+    Test the configuration without calling AWS.
+    
+    Kept separate from main() so test_setup.py can run it in-process.
+    
+    Args:
+        docs_path: Path to the documentation directory
+    """
+    print("=== DRY RUN MODE ===")
+    print(f"Testing configuration with docs_path: {docs_path}")
+    
+    # Test DocumentSearchTool creation
+    from app import DocumentSearchTool
+    tool = DocumentSearchTool(docs_path=docs_path)
+    print(f"✓ DocumentSearchTool initialized with path: {tool.docs_path}")
+    
+    # Check if path exists and list files
+    if os.path.exists(docs_path):
+        from docs_processor import iter_doc_files
+        files = [entry.path for entry in iter_doc_files(docs_path)]
+        print(f"✓ Found {len(files)} documentation files:")
+        for file in files:
+            print(f"  - {file}")
+    else:
+        print(f"⚠ Documentation path does not exist: {docs_path}")
+    
+    print("=== Dry run completed successfully ===")
 
 
 def main():
@@ -104,49 +153,58 @@ def main():
     if args.index:
         print("Indexing documentation...")
         logger.info(f"Starting documentation indexing from: {args.docs_path}")
-        processor = DocumentationProcessor(args.docs_path)
-        processor.index_documentation()
+        from docs_processor import DocumentationProcessor
+        embed = None
+        if args.semantic:
+            from bedrock_integration import BedrockClient
+            embed = BedrockClient(region_name=args.region, profile_name=args.profile).embed
+        processor = DocumentationProcessor(args.docs_path, embed=embed)
+        # Start from the saved index, if any, so only new or modified files
+        # are read and embedded again
+        processor.load_index()
         processor.save_index()
         print("Documentation indexed.")
         logger.info("Documentation indexing completed.")
     
+    # Tagged checks for test_setup.py, which would otherwise start one
+    # interpreter for --help and another for --dry-run
+    if args.selftest:
+        if "--docs-path" in build_parser().format_help():
+            print("HELP_OK")
+        args.dry_run = True
+    
     # If dry-run, just test the configuration and exit
     if args.dry_run:
-        print("=== DRY RUN MODE ===")
-        print(f"Testing configuration with docs_path: {args.docs_path}")
-        
-        # Test DocumentSearchTool creation
-        from app import DocumentSearchTool
-        tool = DocumentSearchTool(docs_path=args.docs_path)
-        print(f"✓ DocumentSearchTool initialized with path: {tool.docs_path}")
-        
-        # Check if path exists and list files
-        if os.path.exists(args.docs_path):
-            files = []
-            for root, _, filenames in os.walk(args.docs_path):
-                for filename in filenames:
-                    if filename.endswith(('.md', '.txt', '.html')):
-                        files.append(os.path.join(root, filename))
-            print(f"✓ Found {len(files)} documentation files:")
-            for file in files:
-                print(f"  - {file}")
-        else:
-            print(f"⚠ Documentation path does not exist: {args.docs_path}")
-        
-        print("=== Dry run completed successfully ===")
+        dry_run(args.docs_path)
+        if args.selftest:
+            print("DRY_RUN_OK")
         return
     
     # Create the agent
+    from app import create_agent
     print(f"Initializing agent with model {args.model_id}...")
     logger.info(f"Creating agent with model_id='{args.model_id}' and docs_path='{args.docs_path}'")
-    agent = create_agent(model_id=args.model_id, docs_path=args.docs_path)
+    agent = create_agent(
+        model_id=args.model_id,
+        docs_path=args.docs_path,
+        semantic_search=args.semantic,
+        region_name=args.region,
+        profile_name=args.profile
+    )
     
     # Register MCP tools if a server URL is provided
     if args.mcp_server:
+        from mcp_integration import register_mcp_tools
         print(f"Registering MCP tools from server: {args.mcp_server}")
         logger.info(f"Registering MCP tools from server: {args.mcp_server}")
         register_mcp_tools(agent.tools, args.mcp_server)
     
+    # Errors that leave the agent's Bedrock client unusable; anything else
+    # (a bad request, a tool failure) is reported and the agent kept
+    from botocore.exceptions import EndpointConnectionError, NoCredentialsError
+    fatal_errors = (NoCredentialsError, EndpointConnectionError)
+    consecutive_errors = 0
+    
     print("\nDocumentation Assistant initialized. Type 'exit' to quit.")
     print("Ask me anything about the documentation!")
     
@@ -166,13 +224,23 @@ def main():
             
             # Display the response
             print(f"\nAssistant: {response.message}")
+            consecutive_errors = 0
         except Exception as e:
             logger.error(f"Error processing user input: {str(e)}", exc_info=True)
             print(f"\nError: {str(e)}")
-            print("Creating a new agent instance to continue...")
-            agent = create_agent(model_id=args.model_id, docs_path=args.docs_path)
-            if args.mcp_server:
-                register_mcp_tools(agent.tools, args.mcp_server)
+            consecutive_errors += 1
+            if isinstance(e, fatal_errors) or consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+                print("Creating a new agent instance to continue...")
+                agent = create_agent(
+                    model_id=args.model_id,
+                    docs_path=args.docs_path,
+                    semantic_search=args.semantic,
+                    region_name=args.region,
+                    profile_name=args.profile
+                )
+                if args.mcp_server:
+                    register_mcp_tools(agent.tools, args.mcp_server)
+                consecutive_errors = 0
 
 
 if __name__ == "__main__":
@@ -4,12 +4,48 @@ MCP (Model Context Protocol) integration for the Strands Documentation Assistant
 This module adds MCP tool support to the agent.
 """
 
-from typing import Dict, Any, List, Optional
-import json
+from typing import Dict, Any, List, Optional, Tuple
+import functools
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from strands.tools.tools import PythonAgentTool as Tool
 
+from tool_output import format_json
+
+# (connect, read) timeouts in seconds for requests to MCP servers
+MCP_TIMEOUT = (3, 30)
+# Most MCP calls from one batch in flight at once
+MCP_MAX_CONCURRENCY = 8
+# Seconds a server's discovered tool list is reused before asking again
+DISCOVERY_TTL = 60
+
+# Discovered tool lists keyed by server URL, with the time they were fetched
+_discovery_cache: Dict[str, Tuple[float, Any]] = {}
+
+
+@functools.lru_cache(maxsize=1)
+def _get_session() -> requests.Session:
+    """
+    Get the HTTP session shared by all MCP tools.
+    
+    The session keeps connections to MCP servers alive between tool calls,
+    so repeated calls skip the TCP and TLS handshakes.
+    
+    Returns:
+        The requests session
+    """
+    session = requests.Session()
+    # Only failed connections and idempotent requests are retried; urllib3
+    # never retries a POST that may have reached the server
+    adapter = HTTPAdapter(pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.1))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
 class MCPTool(Tool):
     """Tool for integrating with MCP servers."""
@@ -38,9 +74,21 @@ class MCPTool(Tool):
                             "parameters": {
                                 "type": "object",
                                 "description": "Parameters to pass to the MCP tool"
+                            },
+                            "calls": {
+                                "type": "array",
+                                "description": "Several independent MCP tool calls to run concurrently, instead of tool_name and parameters",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "tool_name": {"type": "string"},
+                                        "parameters": {"type": "object"}
+                                    },
+                                    "required": ["tool_name", "parameters"]
+                                }
                             }
                         },
-                        "required": ["tool_name", "parameters"]
+                        "required": []
                     }
                 }
             },
@@ -49,59 +97,77 @@ class MCPTool(Tool):
     
     def _execute(self, tool_use, **kwargs) -> Dict[str, Any]:
         """
-        Execute a call to an MCP tool.
+        Execute a call to an MCP tool, or several calls concurrently.
         
         Args:
             tool_use: The tool use request
             **kwargs: Additional keyword arguments
             
         Returns:
-            Response from the MCP tool
+            Response from the MCP tool, with one content item per call
         """
-        try:
-            # Extract parameters from tool_use
-            tool_name = tool_use.get("input", {}).get("tool_name", "")
-            parameters = tool_use.get("input", {}).get("parameters", {})
-            
-            if not tool_name:
-                return {
-                    "toolUseId": tool_use.get("toolUseId", "unknown"),
-                    "status": "error",
-                    "content": [{"text": "No tool name provided"}]
-                }
+        tool_input = tool_use.get("input", {})
+        calls = tool_input.get("calls") or [tool_input]
+        
+        if not isinstance(calls, list) or not all(isinstance(call, dict) for call in calls):
+            return {
+                "toolUseId": tool_use.get("toolUseId", "unknown"),
+                "status": "error",
+                "content": [{"text": "calls must be a list of objects with tool_name and parameters"}]
+            }
+        
+        if not all(call.get("tool_name") for call in calls):
+            return {
+                "toolUseId": tool_use.get("toolUseId", "unknown"),
+                "status": "error",
+                "content": [{"text": "No tool name provided"}]
+            }
+        
+        if len(calls) == 1:
+            outcomes = [self._invoke(calls[0])]
+        else:
+            # The calls are independent, so overlap their round trips
+            with ThreadPoolExecutor(max_workers=min(MCP_MAX_CONCURRENCY, len(calls))) as executor:
+                outcomes = list(executor.map(self._invoke, calls))
+        
+        return {
+            "toolUseId": tool_use.get("toolUseId", "unknown"),
+            "status": "success" if any(ok for ok, _ in outcomes) else "error",
+            "content": [{"text": text} for _, text in outcomes]
+        }
+    
+    def _invoke(self, call: Dict[str, Any]) -> Tuple[bool, str]:
+        """
+        Make one request to the MCP server.
+        
+        Args:
+            call: The tool_name and parameters of the call
             
+        Returns:
+            Tuple of (succeeded, response or error text)
+        """
+        try:
             # Construct the MCP request
             request_data = {
-                "tool": tool_name,
-                "parameters": parameters
+                "tool": call["tool_name"],
+                "parameters": call.get("parameters", {})
             }
             
             # Make the request to the MCP server
-            response = requests.post(
+            response = _get_session().post(
                 f"{self.mcp_server_url}/invoke",
                 json=request_data,
-                headers={"Content-Type": "application/json"}
+                headers={"Content-Type": "application/json"},
+                timeout=MCP_TIMEOUT
             )
             
             # Check if the request was successful
             if response.status_code == 200:
-                return {
-                    "toolUseId": tool_use.get("toolUseId", "unknown"),
-                    "status": "success",
-                    "content": [{"text": json.dumps(response.json(), indent=2)}]
-                }
+                return True, format_json(response.json())
             else:
-                return {
-                    "toolUseId": tool_use.get("toolUseId", "unknown"),
-                    "status": "error",
-                    "content": [{"text": f"MCP request failed with status code {response.status_code}: {response.text}"}]
-                }
+                return False, f"MCP request failed with status code {response.status_code}: {response.text}"
         except Exception as e:
-            return {
-                "toolUseId": tool_use.get("toolUseId", "unknown"),
-                "status": "error",
-                "content": [{"text": f"MCP tool execution failed: {str(e)}"}]
-            }
+            return False, f"MCP tool execution failed: {str(e)}"
 
 
 class MCPToolDiscovery(Tool):
@@ -123,7 +189,12 @@ class MCPToolDiscovery(Tool):
                 "inputSchema": {
                     "json": {
                         "type": "object",
-                        "properties": {},
+                        "properties": {
+                            "force_refresh": {
+                                "type": "boolean",
+                                "description": "Ask the server again instead of reusing a recently discovered tool list"
+                            }
+                        },
                         "required": []
                     }
                 }
@@ -135,6 +206,9 @@ class MCPToolDiscovery(Tool):
         """
         Discover available MCP tools.
         
+        A server's tool list rarely changes, so a successful response is
+        reused for DISCOVERY_TTL seconds unless force_refresh is set.
+        
         Args:
             tool_use: The tool use request
             **kwargs: Additional keyword arguments
@@ -143,18 +217,33 @@ class MCPToolDiscovery(Tool):
             List of available MCP tools
         """
         try:
+            cached = _discovery_cache.get(self.mcp_server_url)
+            if (
+                cached is not None
+                and time.monotonic() - cached[0] < DISCOVERY_TTL
+                and not tool_use.get("input", {}).get("force_refresh")
+            ):
+                return {
+                    "toolUseId": tool_use.get("toolUseId", "unknown"),
+                    "status": "success",
+                    "content": [{"text": cached[1]}]
+                }
+            
             # Make the request to the MCP server
-            response = requests.get(
+            response = _get_session().get(
                 f"{self.mcp_server_url}/tools",
-                headers={"Content-Type": "application/json"}
+                headers={"Content-Type": "application/json"},
+                timeout=MCP_TIMEOUT
             )
             
             # Check if the request was successful
             if response.status_code == 200:
+                text = format_json(response.json())
+                _discovery_cache[self.mcp_server_url] = (time.monotonic(), text)
                 return {
                     "toolUseId": tool_use.get("toolUseId", "unknown"),
                     "status": "success",
-                    "content": [{"text": json.dumps(response.json(), indent=2)}]
+                    "content": [{"text": text}]
                 }
             else:
                 return {
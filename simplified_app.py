@@ -5,10 +5,20 @@ This version doesn't rely on the Strands library.
 """
 
 import os
-import json
-import boto3
+import functools
 import argparse
-from typing import Dict, List, Any, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Any, Optional
+
+from bedrock_integration import DEFAULT_SEMANTIC_THRESHOLD, BedrockClient
+from docs_processor import DocumentationProcessor
+
+
+@functools.lru_cache(maxsize=256)
+def _read_file(file_path: str, mtime_ns: int) -> str:
+    """Read a file's text, cached per (path, modification time)."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
 
 
 class DocumentationAssistant:
@@ -19,7 +29,10 @@ class DocumentationAssistant:
         docs_path: str = "./docs",
         model_id: str = "anthropic.claude-3-sonnet-20240229-v1:0",
         region_name: str = "us-east-1",
-        profile_name: Optional[str] = None
+        profile_name: Optional[str] = None,
+        semantic_search: bool = False,
+        cache_size: int = 128,
+        semantic_cache_threshold: Optional[float] = DEFAULT_SEMANTIC_THRESHOLD
     ):
         """
         Initialize the documentation assistant.
@@ -29,20 +42,32 @@ class DocumentationAssistant:
             model_id: Bedrock model ID to use
             region_name: AWS region name
             profile_name: AWS profile name (optional)
+            semantic_search: Whether to search by embedding similarity
+                using Titan embeddings instead of scanning the files
+            cache_size: Maximum number of model responses to cache (0 disables caching)
+            semantic_cache_threshold: Cosine similarity between questions at or
+                above which a cached answer is reused (None for exact matches only)
         """
         self.docs_path = docs_path
         self.model_id = model_id
+        self.semantic_search = semantic_search
         
-        # Initialize Bedrock client
-        session_kwargs = {}
-        if profile_name:
-            session_kwargs["profile_name"] = profile_name
-            
-        session = boto3.Session(region_name=region_name, **session_kwargs)
-        self.bedrock_runtime = session.client(
-            service_name="bedrock-runtime",
-            region_name=region_name
+        # Initialize Bedrock client. It caches responses so a repeated question
+        # over unchanged documentation reuses the earlier answer; the cache is
+        # cleared whenever a search finds the documentation has changed
+        self.bedrock = BedrockClient(
+            region_name,
+            profile_name,
+            cache_size=cache_size,
+            semantic_threshold=semantic_cache_threshold
         )
+        self.bedrock_runtime = self.bedrock.bedrock_runtime
+        self.embed = self.bedrock.embed if semantic_search else None
+        # Loaded on first search, or in the background after preload()
+        self.processor: Optional[DocumentationProcessor] = None
+        self._preload: Optional[Future] = None
+        # Processor generation the cached responses were answered from
+        self._docs_generation: Optional[int] = None
         
         # Ensure docs directory exists
         if not os.path.exists(docs_path):
@@ -59,31 +84,57 @@ class DocumentationAssistant:
         Returns:
             List of search results
         """
-        results = []
+        processor = self._get_processor()
+        if self.semantic_search:
+            # Embeds the query once and ranks the precomputed chunk vectors
+            results = processor.semantic_search(query, max_results)
+        else:
+            # Served from the processor's in-memory index, which only re-reads
+            # files that changed since the last query. Each query word other
+            # than a stopword is a term; a file scores the sum of each term's
+            # own count (overlapping terms like "doc" and "docs" both count),
+            # and files containing every term rank ahead of the rest
+            results = processor.search(query, max_results)
         
-        # Simple file-based search implementation
-        for root, _, files in os.walk(self.docs_path):
-            for file in files:
-                if file.endswith(('.md', '.txt', '.html')):
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            if query.lower() in content.lower():
-                                # Calculate a simple relevance score based on term frequency
-                                score = content.lower().count(query.lower())
-                                results.append({
-                                    "file": file_path,
-                                    "score": score,
-                                    "preview": content[:200] + "..." if len(content) > 200 else content
-                                })
-                    except Exception as e:
-                        print(f"Error reading file {file_path}: {e}")
-                        
-        # Sort by relevance score and limit results
-        results = sorted(results, key=lambda x: x["score"], reverse=True)[:max_results]
+        # Answers cached before a document changed may no longer hold
+        if processor.generation != self._docs_generation:
+            if self._docs_generation is not None:
+                self.bedrock.clear_cache()
+            self._docs_generation = processor.generation
         return results
     
+    def preload(self) -> None:
+        """
+        Start loading the documentation index in the background.
+        
+        Lets loading (or indexing, the first time) overlap with the user
+        typing their first question.
+        """
+        if self.processor is None and self._preload is None:
+            executor = ThreadPoolExecutor(max_workers=1)
+            self._preload = executor.submit(self._load_processor)
+            # The submitted load still runs; this just lets its thread exit after
+            executor.shutdown(wait=False)
+    
+    def _get_processor(self) -> DocumentationProcessor:
+        """Get the documentation processor, loading the saved index on first use."""
+        if self.processor is None:
+            # A failed preload is retried here rather than remembered
+            preload, self._preload = self._preload, None
+            self.processor = preload.result() if preload is not None else self._load_processor()
+        return self.processor
+    
+    def _load_processor(self) -> DocumentationProcessor:
+        """
+        Create a documentation processor from the saved index.
+        
+        Without a saved index (see main.py --index) the documentation is
+        indexed from scratch instead.
+        """
+        processor = DocumentationProcessor(self.docs_path, embed=self.embed)
+        processor.load_index()
+        return processor
+    
     def read_doc(self, file_path: str) -> Dict[str, Any]:
         """
         Read a documentation file.
@@ -95,12 +146,12 @@ class DocumentationAssistant:
             Dictionary with file content
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                return {
-                    "file": file_path,
-                    "content": content
-                }
+            # Keyed on the modification time so an edited file is read again
+            content = _read_file(file_path, os.stat(file_path).st_mtime_ns)
+            return {
+                "file": file_path,
+                "content": content
+            }
         except Exception as e:
             return {"error": f"Failed to read file {file_path}: {str(e)}"}
     
@@ -123,67 +174,35 @@ class DocumentationAssistant:
         Returns:
             The model's response text
         """
-        # Handle different model providers
-        if "anthropic" in self.model_id.lower():
-            return self._invoke_anthropic(prompt, max_tokens, temperature, top_p)
-        elif "amazon" in self.model_id.lower():
-            return self._invoke_amazon(prompt, max_tokens, temperature, top_p)
-        else:
-            raise ValueError(f"Unsupported model provider in model_id: {self.model_id}")
+        return "".join(self.invoke_bedrock_stream(prompt, max_tokens, temperature, top_p))
     
-    def _invoke_anthropic(
+    def invoke_bedrock_stream(
         self, 
         prompt: str,
-        max_tokens: int,
-        temperature: float,
-        top_p: float
-    ) -> str:
-        """Invoke an Anthropic model."""
-        request_body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": max_tokens,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "temperature": temperature,
-            "top_p": top_p
-        }
+        max_tokens: int = 2048,
+        temperature: float = 0.7,
+        top_p: float = 0.9,
+        cache_text: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Invoke a Bedrock model and yield its response text as it is generated.
         
-        response = self.bedrock_runtime.invoke_model(
-            modelId=self.model_id,
-            body=json.dumps(request_body)
-        )
+        Cached responses are yielded in a single piece.
         
-        response_body = json.loads(response.get("body").read())
-        return response_body.get("content")[0].get("text")
-    
-    def _invoke_amazon(
-        self, 
-        prompt: str,
-        max_tokens: int,
-        temperature: float,
-        top_p: float
-    ) -> str:
-        """Invoke an Amazon model."""
-        request_body = {
-            "inputText": prompt,
-            "textGenerationConfig": {
-                "maxTokenCount": max_tokens,
-                "temperature": temperature,
-                "topP": top_p
-            }
-        }
-        
-        response = self.bedrock_runtime.invoke_model(
-            modelId=self.model_id,
-            body=json.dumps(request_body)
+        Args:
+            prompt: The prompt to send to the model
+            max_tokens: Maximum number of tokens to generate
+            temperature: Temperature for sampling
+            top_p: Top-p sampling parameter
+            cache_text: Text compared by embedding to find a cached answer to
+                a similar request (optional; defaults to the prompt)
+            
+        Yields:
+            Pieces of the model's response text
+        """
+        return self.bedrock.invoke_model_stream(
+            self.model_id, prompt, max_tokens, temperature, top_p, cache_text=cache_text
         )
-        
-        response_body = json.loads(response.get("body").read())
-        return response_body.get("results")[0].get("outputText")
     
     def process_query(self, query: str) -> str:
         """
@@ -195,11 +214,24 @@ class DocumentationAssistant:
         Returns:
             Response to the user
         """
+        return "".join(self.process_query_stream(query))
+    
+    def process_query_stream(self, query: str) -> Iterator[str]:
+        """
+        Process a user query, yielding the response as it is generated.
+        
+        Args:
+            query: User query
+            
+        Yields:
+            Pieces of the response to the user
+        """
         # First, search for relevant documentation
         search_results = self.search_docs(query)
         
         if not search_results:
-            return "I couldn't find any relevant documentation for your query."
+            yield "I couldn't find any relevant documentation for your query."
+            return
         
         # Read the content of the top results
         doc_contents = []
@@ -213,7 +245,8 @@ class DocumentationAssistant:
                 })
         
         if not doc_contents:
-            return "I found some documentation but couldn't read the content."
+            yield "I found some documentation but couldn't read the content."
+            return
         
         # Construct a prompt for the model
         prompt = f"""
@@ -235,10 +268,11 @@ class DocumentationAssistant:
         
         # Invoke the model
         try:
-            response = self.invoke_bedrock(prompt)
-            return response
+            # Similar prompts share most of their text (the same documents),
+            # so answers are matched on the question alone
+            yield from self.invoke_bedrock_stream(prompt, cache_text=query)
         except Exception as e:
-            return f"I encountered an error while processing your query: {str(e)}"
+            yield f"I encountered an error while processing your query: {str(e)}"
 
 
 def parse_args():
@@ -268,6 +302,17 @@ def parse_args():
         default=None,
         help="AWS profile name"
     )
+    parser.add_argument(
+        "--semantic", 
+        action="store_true",
+        help="Search by embedding similarity (uses the index written by main.py --index --semantic)"
+    )
+    parser.add_argument(
+        "--semantic-cache-threshold", 
+        type=float, 
+        default=DEFAULT_SEMANTIC_THRESHOLD,
+        help="Reuse the answer to an earlier question at least this similar (0 disables)"
+    )
     return parser.parse_args()
 
 
@@ -280,9 +325,14 @@ def main():
         docs_path=args.docs_path,
         model_id=args.model_id,
         region_name=args.region,
-        profile_name=args.profile
+        profile_name=args.profile,
+        semantic_search=args.semantic,
+        semantic_cache_threshold=args.semantic_cache_threshold if args.semantic_cache_threshold > 0 else None
     )
     
+    # Load the index while the user types their first question
+    assistant.preload()
+    
     print("\nDocumentation Assistant initialized. Type 'exit' to quit.")
     print("Ask me anything about the documentation!")
     
@@ -294,11 +344,11 @@ def main():
             print("Goodbye!")
             break
         
-        # Process the user's request
-        response = assistant.process_query(user_input)
-        
-        # Display the response
-        print(f"\nAssistant: {response}")
+        # Process the user's request, displaying the response as it arrives
+        print("\nAssistant: ", end="", flush=True)
+        for text in assistant.process_query_stream(user_input):
+            print(text, end="", flush=True)
+        print()
 
 
 if __name__ == "__main__":
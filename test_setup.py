@@ -4,106 +4,179 @@ Simple setup validation script for Strands Documentation Assistant.
 Run this to verify your installation is working correctly.
 """
 
+import contextlib
+import importlib.util
+import io
 import os
 import sys
-import subprocess
 import tempfile
-import shutil
+from functools import lru_cache, partial
+
+# Shared credentials file the AWS SDKs fall back to
+_CRED_PATH = os.path.expanduser('~/.aws/credentials')
+
+# Required packages, cheapest to look up first so a missing one fails fast
+_REQUIRED = ('requests', 'boto3')
+
+# Whether the self-test fallback can start another interpreter at all
+_PYTHON_OK = bool(sys.executable) and os.access(sys.executable, os.X_OK)
+
+# Summary status labels; plain text when the output goes to a log rather
+# than a terminal
+_STATUS = ("✅ PASS", "❌ FAIL") if sys.stdout.isatty() else ("PASS", "FAIL")
+
+# Contents of the test.md the CLI checks run against
+_TEST_DOC = b"# Test Documentation\n\nThis is a test file for validation."
+
+@lru_cache(maxsize=None)
+def has_module(name):
+    """Check whether a module is installed without importing it."""
+    return importlib.util.find_spec(name) is not None
 
 def test_python_version():
     """Test if Python version is compatible."""
     print("🔍 Checking Python version...")
-    version = sys.version_info
-    if version.major == 3 and version.minor >= 9:
-        print(f"✅ Python {version.major}.{version.minor}.{version.micro} is compatible")
+    version = "{0.major}.{0.minor}.{0.micro}".format(sys.version_info)
+    if sys.version_info >= (3, 9):
+        print(f"✅ Python {version} is compatible")
         return True
     else:
-        print(f"❌ Python {version.major}.{version.minor}.{version.micro} is not supported. Please use Python 3.9+")
+        print(f"❌ Python {version} is not supported. Please use Python 3.9+")
         return False
 
 def test_dependencies():
     """Test if required dependencies are installed."""
     print("\n🔍 Checking dependencies...")
-    required_packages = ['boto3', 'requests']
-    
     try:
-        # Try importing strands - this might fail if not installed
-        import strands
-        print("✅ strands-agent is available")
-    except ImportError:
-        print("⚠️  strands-agent not found - this is expected if testing locally")
-        print("   Install with: pip install strands-agent")
+        # find_spec only consults the import system's finders, so these checks
+        # don't pay for running boto3's (or strands') module initialization
+        if has_module('strands'):
+            print("✅ strands-agent is available")
+        else:
+            print("⚠️  strands-agent not found - this is expected if testing locally")
+            print("   Install with: pip install strands-agent")
+        
+        for package in _REQUIRED:
+            if has_module(package):
+                print(f"✅ {package} is installed")
+            else:
+                print(f"❌ {package} is not installed")
+                return False
+        
+        return True
+    except Exception as e:
+        print(f"❌ Dependency check failed: {e}")
+        return False
+
+def write_test_docs(docs_path):
+    """Write the documentation file the tests run against."""
+    test_file = os.path.join(docs_path, "test.md")
+    # A fixed ASCII payload, so skip the text layer and write the bytes
+    fd = os.open(test_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, _TEST_DOC)
+    finally:
+        os.close(fd)
+
+@lru_cache(maxsize=None)
+def run_selftest(docs_path):
+    """
+    Run main.py's self-test against a docs directory, once.
     
-    for package in required_packages:
-        try:
-            __import__(package)
-            print(f"✅ {package} is installed")
-        except ImportError:
-            print(f"❌ {package} is not installed")
-            return False
+    Only used when main.py can't be imported here; the CLI parsing and
+    dry-run fallbacks then share this single interpreter start.
+    
+    Returns:
+        Tuple of (returncode, stdout, stderr)
+    """
+    if not _PYTHON_OK:
+        return 1, "", f"Python interpreter is not executable: {sys.executable!r}"
+    
+    import subprocess
     
-    return True
+    # No stdin: if the self-test ever fell through to the interactive
+    # loop, it would hit EOF straight away instead of waiting out the timeout
+    result = subprocess.run([
+        sys.executable, 'main.py', 
+        '--docs-path', docs_path,
+        '--selftest'
+    ], stdin=subprocess.DEVNULL, capture_output=True, text=True,
+        check=False, timeout=30)
+    return result.returncode, result.stdout, result.stderr
 
-def test_cli_parsing():
+def test_cli_parsing(docs_path):
     """Test command line argument parsing."""
     print("\n🔍 Testing CLI argument parsing...")
     try:
-        result = subprocess.run([
-            sys.executable, 'main.py', '--help'
-        ], capture_output=True, text=True, timeout=10)
+        try:
+            # main.py defers its heavy imports, so this only loads argparse
+            from main import build_parser
+            help_ok = '--docs-path' in build_parser().format_help()
+            stderr = ""
+        except ImportError:
+            _, stdout, stderr = run_selftest(docs_path)
+            help_ok = 'HELP_OK' in stdout.splitlines()
         
-        if result.returncode == 0 and '--docs-path' in result.stdout:
+        if help_ok:
             print("✅ CLI argument parsing works")
             return True
         else:
             print("❌ CLI argument parsing failed")
-            print(f"   Error: {result.stderr}")
+            print(f"   Error: {stderr}")
             return False
     except Exception as e:
         print(f"❌ CLI test failed: {e}")
         return False
 
-def test_dry_run():
+def test_dry_run(docs_path):
     """Test dry-run functionality with a temporary docs directory."""
     print("\n🔍 Testing dry-run mode...")
-    
-    # Create temporary directory with test docs
-    with tempfile.TemporaryDirectory() as temp_dir:
-        test_file = os.path.join(temp_dir, "test.md")
-        with open(test_file, 'w') as f:
-            f.write("# Test Documentation\n\nThis is a test file for validation.")
-        
+    try:
         try:
-            result = subprocess.run([
-                sys.executable, 'main.py', 
-                '--docs-path', temp_dir,
-                '--dry-run'
-            ], capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0 and 'DRY RUN MODE' in result.stdout:
-                print("✅ Dry-run mode works")
-                print(f"   Found test documentation in: {temp_dir}")
-                return True
-            else:
-                print("❌ Dry-run mode failed")
-                print(f"   stdout: {result.stdout}")
-                print(f"   stderr: {result.stderr}")
-                return False
-        except Exception as e:
-            print(f"❌ Dry-run test failed: {e}")
+            # Same code path as --dry-run, without starting an interpreter
+            from main import dry_run
+        except ImportError:
+            dry_run = None
+        
+        if dry_run is not None:
+            # Errors raised by the dry run itself are failures, not a reason
+            # to retry it in a subprocess that would fail the same way
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                dry_run(docs_path)
+            stdout = output.getvalue()
+            stderr = ""
+            dry_run_ok = 'DRY RUN MODE' in stdout
+        else:
+            returncode, stdout, stderr = run_selftest(docs_path)
+            dry_run_ok = returncode == 0 and 'DRY_RUN_OK' in stdout.splitlines()
+        
+        if dry_run_ok:
+            print("✅ Dry-run mode works")
+            print(f"   Found test documentation in: {docs_path}")
+            return True
+        else:
+            print("❌ Dry-run mode failed")
+            print(f"   stdout: {stdout}")
+            print(f"   stderr: {stderr}")
             return False
+    except Exception as e:
+        print(f"❌ Dry-run test failed: {e}")
+        return False
+
+def has_aws_credentials():
+    """Check for AWS credentials in the environment or the shared file."""
+    # Only stat the file when the env isn't set
+    return bool(
+        os.environ.get('AWS_ACCESS_KEY_ID') or 
+        os.path.isfile(_CRED_PATH)
+    )
 
 def test_aws_config():
     """Test if AWS configuration is available (optional)."""
     print("\n🔍 Checking AWS configuration (optional)...")
     
-    # Check for AWS credentials
-    has_credentials = (
-        os.environ.get('AWS_ACCESS_KEY_ID') or 
-        os.path.exists(os.path.expanduser('~/.aws/credentials'))
-    )
-    
-    if has_credentials:
+    if has_aws_credentials():
         print("✅ AWS credentials found")
         return True
     else:
@@ -112,52 +185,65 @@ def test_aws_config():
         print("   For full functionality, run: aws configure")
         return True  # Not a failure
 
+def run_buffered(test_func):
+    """Run a test, writing its output in one go once it finishes."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = test_func()
+    sys.stdout.write(output.getvalue())
+    return result
+
 def main():
     """Run all validation tests."""
     print("=" * 60)
     print("🧪 Strands Documentation Assistant - Setup Validation")
     print("=" * 60)
     
-    tests = [
-        ("Python Version", test_python_version),
-        ("Dependencies", test_dependencies),
-        ("CLI Parsing", test_cli_parsing),
-        ("Dry Run Mode", test_dry_run),
-        ("AWS Configuration", test_aws_config),
-    ]
-    
-    results = []
-    for test_name, test_func in tests:
-        try:
-            result = test_func()
-            results.append((test_name, result))
-        except Exception as e:
-            print(f"❌ {test_name} test crashed: {e}")
-            results.append((test_name, False))
+    # One temporary docs directory shared by every test that needs one
+    with tempfile.TemporaryDirectory() as docs_path:
+        write_test_docs(docs_path)
+        
+        tests = [
+            ("Python Version", test_python_version),
+            ("Dependencies", test_dependencies),
+            ("CLI Parsing", partial(test_cli_parsing, docs_path)),
+            ("Dry Run Mode", partial(test_dry_run, docs_path)),
+        ]
+        # Missing credentials only ever warn, so CI runs without them skip
+        # the check rather than print a warning nobody reads
+        if not os.environ.get('CI') or has_aws_credentials():
+            tests.append(("AWS Configuration", test_aws_config))
+        
+        # Each test reports its own failures and returns False
+        results = [(test_name, run_buffered(test_func)) for test_name, test_func in tests]
     
-    # Summary
-    print("\n" + "=" * 60)
-    print("📋 SUMMARY")
-    print("=" * 60)
+    # Summary, printed in one go
+    lines = ["", "=" * 60, "📋 SUMMARY", "=" * 60]
     
     passed = 0
     for test_name, result in results:
-        status = "✅ PASS" if result else "❌ FAIL"
-        print(f"{status} {test_name}")
+        status = _STATUS[0] if result else _STATUS[1]
+        lines.append(f"{status} {test_name}")
         if result:
             passed += 1
     
-    print(f"\n🎯 {passed}/{len(results)} tests passed")
+    lines.append(f"\n🎯 {passed}/{len(results)} tests passed")
     
-    if passed == len(results):
-        print("\n🎉 All tests passed! Your setup is ready.")
-        print("\nNext steps:")
-        print("  1. Add documentation files to ./docs/ directory")
-        print("  2. Run: python main.py --dry-run")
-        print("  3. Configure AWS: aws configure")
-        print("  4. Run: python main.py")
+    all_passed = passed == len(results)
+    if all_passed:
+        lines += [
+            "\n🎉 All tests passed! Your setup is ready.",
+            "\nNext steps:",
+            "  1. Add documentation files to ./docs/ directory",
+            "  2. Run: python main.py --dry-run",
+            "  3. Configure AWS: aws configure",
+            "  4. Run: python main.py",
+        ]
     else:
-        print("\n⚠️  Some tests failed. Please check the issues above.")
+        lines.append("\n⚠️  Some tests failed. Please check the issues above.")
+    print("\n".join(lines))
+    
+    if not all_passed:
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Formatting of tool results for the Strands Documentation Assistant.
+This module provides helpers shared by the agent's tools.
+"""
+
+import json
+from typing import Any
+
+
+def format_json(data: Any) -> str:
+    """
+    Serialize data returned to the model by a tool.
+    
+    Compact output keeps json on its C encoder (indent forces the pure-Python
+    one) and doesn't spend tokens on whitespace.
+    
+    Args:
+        data: JSON-serializable data
+        
+    Returns:
+        The compact JSON text
+    """
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))